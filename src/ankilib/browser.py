@@ -2,7 +2,7 @@
 import os.path
 from datetime import datetime
 from enum import Enum
-from typing import Iterable, List, Optional, Sequence, Tuple
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
 
 import aqt
 from PyQt5.QtCore import Qt
@@ -16,6 +16,7 @@ from aqt.browser import Browser
 from . import global_vars as gv
 from ..pylib.conv_util import detect_syntax, squash_newlines
 from ..pylib.converter import convert
+from ..pylib.dictionary import Dictionary
 from ..pylib.html_processing import strip_html
 from ..pylib.mecab import MecabError
 from ..pylib.output import OutputType, fmt_jrp, fmt_migaku, insert_nbsp
@@ -32,9 +33,9 @@ def units_to_plain(lines: Iterable[Iterable[Unit]]) -> Iterable[str]:
     return ("".join(u.text() for u in units) for units in lines)
 
 
-def convert_lines(lines: Iterable[str]) -> Optional[List[List[Unit]]]:
+def convert_lines(lines: Sequence[str], dic: Dictionary) -> Optional[List[List[Unit]]]:
     try:
-        return [convert(gv.mecab_handle.analyze(line), gv.prefs.convert, gv.dictionary) for line in lines]
+        return [convert(units, gv.prefs.convert, dic) for units in gv.mecab_handle.analyze_many(lines)]
     except MecabError as e:
         aqt.utils.showWarning(f"Mecab error, stopping conversion: {e}")
         return None
@@ -56,18 +57,17 @@ def convert_notes(brws: Browser, note_ids: Sequence[NoteId], field_idx: int,
     failed_notes: List[NoteId] = []
     updated_notes: List[Note] = []
     backup_data: List[Tuple[NoteId, str, str]] = []
+    # the dictionary might be reloaded in the meantime, all notes should be converted with the same one
+    dic = gv.dictionary
+    formatter = fmt_migaku if conv_type == ConvType.MIGAKU else fmt_jrp
+    output_prefs = gv.prefs.output if regen else None
+    # lines that need to be analyzed are collected first so that MeCab can process all of them in one go
+    new_vals: List[Tuple[Note, str, Union[str, List[str]]]] = []
 
     for note_id in note_ids:
         note = brws.col.get_note(note_id)
         field = note.fields[field_idx]
 
-        def update_note(new_val: str):
-            if not dry_run:
-                if backup:
-                    backup_data.append((note_id, field, new_val))
-                note.fields[field_idx] = new_val
-                updated_notes.append(note)
-
         lines = strip_html(squash_newlines(field))
         existing_type = detect_syntax(field)
         if existing_type:
@@ -83,21 +83,27 @@ def convert_notes(brws: Browser, note_ids: Sequence[NoteId], field_idx: int,
                 continue
 
             if conv_type == ConvType.REMOVE:
-                update_note(insert_nbsp("<br>".join(units_to_plain(line_units))))
-                continue
+                new_vals.append((note, field, insert_nbsp("<br>".join(units_to_plain(line_units)))))
             elif regen:
-                line_units = convert_lines(units_to_plain(line_units))
-        else:
-            if conv_type == ConvType.REMOVE:
-                continue
-            line_units = convert_lines(lines)
-
-        if line_units is None:
-            return
-
-        formatter = fmt_migaku if conv_type == ConvType.MIGAKU else fmt_jrp
-        output_prefs = gv.prefs.output if regen else None
-        update_note("<br>".join(formatter(units, output_prefs) for units in line_units))
+                new_vals.append((note, field, list(units_to_plain(line_units))))
+            else:
+                new_vals.append((note, field, "<br>".join(formatter(units, output_prefs) for units in line_units)))
+        elif conv_type != ConvType.REMOVE:
+            new_vals.append((note, field, lines))
+
+    converted = convert_lines([line for _, _, val in new_vals if isinstance(val, list) for line in val], dic)
+    if converted is None:
+        return
+
+    conv_itr = iter(converted)
+    for note, field, val in new_vals:
+        if isinstance(val, list):
+            val = "<br>".join(formatter(next(conv_itr), output_prefs) for _ in val)
+        if not dry_run:
+            if backup:
+                backup_data.append((note.id, field, val))
+            note.fields[field_idx] = val
+            updated_notes.append(note)
 
     backup_msg = ""
     if backup:
@@ -211,6 +211,8 @@ def add_form_row(parent: QWidget, prefs: T, defaults: T,
         edit_wdgt.clicked.connect(lambda s: set_val(bool(s)))
     elif item["type"] == WidgetType.Number:
         edit_wdgt = QSpinBox(parent)
+        if "max" in item:
+            edit_wdgt.setMaximum(item["max"])
         edit_wdgt.setValue(val)
         edit_wdgt.valueChanged.connect(set_val)
     elif item["type"] in [WidgetType.Color, WidgetType.Directory, WidgetType.File]:
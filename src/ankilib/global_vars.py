@@ -1,8 +1,11 @@
 # This project is licensed under the terms of the GNU GPL v3: https://www.gnu.org/licenses/; © 2022 Ben Kerman
 import os.path
+import sqlite3
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from lzma import LZMAError
 from os.path import dirname
-from typing import Optional, Type, TypeVar
+from typing import Dict, List, Optional, Tuple, Type, TypeVar, Union
 
 import aqt
 from anki.collection import Collection
@@ -10,8 +13,11 @@ from aqt.operations import QueryOp
 
 from .templates import update_all_note_types
 from .util import get_path
-from ..pylib.dictionary import AccentEntry, BasicDict, Dictionary, VariantEntry
-from ..pylib.mecab import Mecab
+from ..pylib.analysis_cache import AnalysisCache, CachedMecab, fingerprint
+from ..pylib.compiled_dict import CompiledDict, CompiledDictError
+from ..pylib.dictionary import AccentEntry, BasicDict, Dictionary, LazyDict, VariantEntry
+from ..pylib.mecab import MecabPool, Tokenizer
+from ..pylib.sqlite_dict import SqliteDict
 from ..pylib.preferences import Prefs
 from ..pylib.util import ConfigError
 
@@ -40,6 +46,11 @@ def update_prefs(new_prefs: Prefs):
     update_all_note_types(aqt.mw.col, new_prefs.addon, prefs and prefs.addon)
     prefs = new_prefs
     init_mecab()
+    # which backend the dictionary uses depends on the preferences, so it's only loaded once they are available
+    if not dict_load_started:
+        start_initial_load()
+    if dictionary:
+        dictionary.cache.resize(prefs.addon.lookup_cache_size)
 
 
 def save_prefs():
@@ -56,12 +67,40 @@ def init_mecab():
     global mecab_handle
     exe_path = None if prefs.addon.mecab_use_system_exe else get_path(prefs.addon.mecab_path)
     dir_path = None if prefs.addon.mecab_use_system_dict else get_path(prefs.addon.mecab_dict_dir)
-    mecab_handle = Mecab(exe_path, dir_path)
+    if mecab_handle:
+        mecab_handle.close()
+    mecab_handle = MecabPool(exe_path, dir_path, prefs.addon.mecab_processes, prefs.addon.mecab_in_process)
+    if prefs.addon.analysis_cache_size > 0 or prefs.addon.analysis_disk_cache_size > 0:
+        db_path = os.path.join(dirname(aqt.mw.col.path), "jrp-analysis-cache.sqlite")
+        cache = AnalysisCache(fingerprint(exe_path, dir_path), prefs.addon.analysis_cache_size,
+                              db_path, prefs.addon.analysis_disk_cache_size)
+        mecab_handle = CachedMecab(mecab_handle, cache)
 
 
 def load_dict():
-    def load_data(desc: str, filename: str, entry_t: Type[T]) -> BasicDict[T]:
+    global data_states
+    data_states = data_file_states()
+
+    def load_compiled(path: str, entry_t: Type[T]) -> Optional[CompiledDict[T]]:
+        compiled_path = os.path.splitext(path)[0] + ".jrpd"
+        if not os.path.exists(compiled_path):
+            return None
+        try:
+            compiled = CompiledDict(entry_t, compiled_path)
+            if os.path.exists(path) and not compiled.is_current(path):
+                print(f"ignoring outdated compiled dictionary: {compiled_path}")
+                compiled.close()
+                return None
+            return compiled
+        except (OSError, CompiledDictError) as e:
+            print(f"failed to open compiled dictionary, falling back on {path}: {e}")
+            return None
+
+    def load_data(desc: str, filename: str, entry_t: Type[T]) \
+            -> Union[BasicDict[T], LazyDict[T], CompiledDict[T], SqliteDict[T], None]:
         path = get_path("data", filename)
+        if compiled := load_compiled(path, entry_t):
+            return compiled
         if not os.path.exists(path):
             aqt.mw.taskman.run_on_main(
                 lambda: aqt.utils.showWarning(
@@ -71,8 +110,17 @@ def load_dict():
             )
         else:
             try:
-                return BasicDict(entry_t, path)
-            except (OSError, LZMAError) as e:
+                start = time.perf_counter()
+                if prefs.addon.sqlite_dictionary:
+                    bdict = SqliteDict.open(entry_t, path, os.path.splitext(path)[0] + ".sqlite")
+                elif prefs.addon.lazy_dictionary:
+                    bdict = LazyDict(entry_t, path)
+                else:
+                    bdict = BasicDict(entry_t, path, os.path.splitext(path)[0] + ".snapshot")
+                phases = ", ".join(f"{phase} {secs:.2f}s" for phase, secs in bdict.timings.items())
+                print(f"loaded {filename} in {time.perf_counter() - start:.2f}s ({phases})")
+                return bdict
+            except (OSError, LZMAError, sqlite3.Error) as e:
                 aqt.mw.taskman.run_on_main(
                     lambda: aqt.utils.showWarning(
                         f"Loading {path} failed, reading/accent generation will not work:\n{e}",
@@ -80,18 +128,144 @@ def load_dict():
                     )
                 )
 
-    acc_dic = load_data("accent", "accents.xz", AccentEntry)
-    var_dic = load_data("variants", "variants.xz", VariantEntry)
+    # parsing in worker processes isn't possible here: Anki has no standalone interpreter to spawn and importing
+    # the add-on package in a child would pull in aqt, so the files are only loaded concurrently
+    with ThreadPoolExecutor(2) as executor:
+        acc_fut = executor.submit(load_data, "accent", "accents.xz", AccentEntry)
+        var_fut = executor.submit(load_data, "variants", "variants.xz", VariantEntry)
+        acc_dic, var_dic = acc_fut.result(), var_fut.result()
     if acc_dic and var_dic:
         global dictionary
-        dictionary = Dictionary(acc_dic, var_dic)
+        dic = Dictionary(acc_dic, var_dic)
+        dic.cache.resize(prefs.addon.lookup_cache_size)
+        load_user_dicts(dic)
+        # on startup the dictionary is usable before the remaining indexes are built,
+        # a reloaded one only replaces the old instance once it's complete
+        if dictionary is None:
+            dictionary = dic
+        # lazy, compiled and database dictionaries are only materialized on demand, the prefix index and the table
+        # would defeat that since they hold all keys in memory; without the index the converter tries every prefix
+        # the key filter only speeds up lookups that don't go through the table, it's useless once that exists
+        if isinstance(acc_dic, BasicDict) and isinstance(var_dic, BasicDict):
+            dic.build_prefix_index()
+            dic.build_resolution_table()
+        else:
+            dic.build_key_filter()
+        dictionary = dic
+        print(dic.report())
+
+
+def user_dict_dir() -> str:
+    return get_path("user_files", "dictionaries")
+
+
+def user_dict_paths() -> List[str]:
+    dir_path = user_dict_dir()
+    if not os.path.isdir(dir_path):
+        return []
+    return [os.path.join(dir_path, fn) for fn in sorted(os.listdir(dir_path)) if fn.endswith(".tsv")]
+
+
+def load_user_dict(dic: Dictionary, path: str):
+    try:
+        dic.load_layer(path)
+        print(f"loaded user dictionary {os.path.basename(path)}")
+    except (OSError, ValueError) as e:
+        print(f"failed to load user dictionary {path}: {e}")
+
+
+def load_user_dicts(dic: Dictionary):
+    # loaded in alphabetical order, entries from later files take precedence
+    for path in user_dict_paths():
+        load_user_dict(dic, path)
+
+
+FileState = Optional[Tuple[int, int]]
+
+
+def data_file_states() -> Dict[str, FileState]:
+    def file_state(path: str) -> FileState:
+        try:
+            stat = os.stat(path)
+            return stat.st_size, stat.st_mtime_ns
+        except OSError:
+            return None
+
+    return {path: file_state(path) for path in base_data_paths() + user_dict_paths()}
+
+
+def base_data_paths() -> List[str]:
+    return [get_path("data", fn) for fn in ("accents.xz", "accents.jrpd", "variants.xz", "variants.jrpd")]
+
+
+def reload_changed_data(states: Dict[str, FileState]):
+    global data_states, dictionary
+    if not dictionary or any(states[path] != data_states[path] for path in base_data_paths()):
+        print("dictionary data changed, reloading")
+        load_dict()
+        return
+
+    # user dictionaries are small and can be reloaded individually, conversions that are running keep using the
+    # previous instance until the copy with the changed layers replaces it
+    dic = dictionary.copy()
+    for path in sorted(states.keys() | data_states.keys()):
+        if path not in states:
+            dic.remove_layer(path)
+            print(f"removed user dictionary {os.path.basename(path)}")
+        elif states[path] != data_states.get(path):
+            load_user_dict(dic, path)
+    dictionary = dic
+    data_states = states
+
+
+def check_data_files():
+    global pending_states, reloading
+    if reloading or data_states is None:
+        return
+    states = data_file_states()
+    if states == data_states:
+        pending_states = None
+        return
+    # files might still be in the process of being written, only reload once they've stopped changing
+    if states != pending_states:
+        pending_states = states
+        return
+
+    def on_done(fut: Future):
+        global reloading
+        reloading = False
+        try:
+            fut.result()
+        except Exception as e:
+            print(f"reloading dictionary data failed: {e}")
+
+    pending_states = None
+    reloading = True
+    aqt.mw.taskman.run_in_background(lambda: reload_changed_data(states), on_done)
+
+
+def start_watcher():
+    aqt.mw.progress.timer(5000, check_data_files, repeat=True, requiresCollection=False)
 
 
 prefs: Optional[Prefs] = None
-mecab_handle: Optional[Mecab] = None
+mecab_handle: Optional[Tokenizer] = None
 dictionary: Optional[Dictionary] = None
+data_states: Optional[Dict[str, FileState]] = None
+pending_states: Optional[Dict[str, FileState]] = None
+reloading = False
+dict_load_started = False
+
+
+def _initial_load_done(_):
+    print("JRP data loaded")
+    start_watcher()
+
 
-QueryOp(parent=aqt.mw, op=lambda col: load_dict(), success=lambda _: print("JRP data loaded")).run_in_background()
+def start_initial_load():
+    global dict_load_started
+    dict_load_started = True
+    QueryOp(parent=aqt.mw, op=lambda col: load_dict(), success=_initial_load_done).run_in_background()
 
 
 def convert_check() -> bool:
@@ -114,6 +114,54 @@ addon_defs = [
         "tool": "Ignore the dictionary path from above and use "
                 "the default location compiled into the executable.",
         "type": WidgetType.Checkbox
+    }, {
+        "name": "mecab_processes",
+        "desc": "Number of MeCab processes",
+        "tool": "How many MeCab processes are used to analyze large batches of notes in parallel.\n"
+                "0 uses one process per CPU core.",
+        "type": WidgetType.Number,
+        "max": 64
+    }, {
+        "name": "mecab_in_process",
+        "desc": "Load MeCab as a library",
+        "tool": "Run MeCab inside Anki using the MeCab library next to the executable instead of starting processes.\n"
+                "Avoids the overhead of communicating with separate processes.\n"
+                "If the library can't be found, the executable is used as usual.",
+        "type": WidgetType.Checkbox
+    }, {
+        "name": "analysis_cache_size",
+        "desc": "MeCab analysis cache size",
+        "tool": "Maximum number of analyzed lines kept in memory.\n"
+                "Speeds up converting the same sentences again, 0 disables the cache.",
+        "type": WidgetType.Number,
+        "max": 1000000
+    }, {
+        "name": "analysis_disk_cache_size",
+        "desc": "MeCab analysis disk cache size",
+        "tool": "Maximum number of analyzed lines stored in a database in your profile's directory,\n"
+                "which is kept between restarts. 0 disables the database.",
+        "type": WidgetType.Number,
+        "max": 10000000
+    }, {
+        "name": "lookup_cache_size",
+        "desc": "Dictionary lookup cache size",
+        "tool": "Maximum number of dictionary lookup results kept in memory.\n"
+                "Speeds up converting text that repeatedly uses the same words, 0 disables the cache.",
+        "type": WidgetType.Number,
+        "max": 1000000
+    }, {
+        "name": "lazy_dictionary",
+        "desc": "Load dictionary entries on demand",
+        "tool": "Only index the dictionary files on startup and create entries the first time they are looked up.\n"
+                "Starts faster and uses less memory, but individual lookups are slower. Requires a restart.",
+        "type": WidgetType.Checkbox
+    }, {
+        "name": "sqlite_dictionary",
+        "desc": "Keep dictionary in an SQLite database",
+        "tool": "Store the dictionary in a database next to the data files instead of loading it into memory.\n"
+                "Uses the least memory but makes lookups considerably slower, takes precedence over the option above.\n"
+                "The database is created on the first start, which takes a while. Requires a restart.",
+        "type": WidgetType.Checkbox
     }
 ]
 
@@ -0,0 +1,241 @@
+#!/bin/python
+# This project is licensed under the terms of the GNU GPL v3: https://www.gnu.org/licenses/; © 2022 Ben Kerman
+import lzma
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pylib.converter import convert
+from pylib.dictionary import AccentEntry, BasicDict, Dictionary, LazyDict, VariantEntry
+from pylib.mecab import Mecab, MecabUnit
+from pylib.mecab_recording import MecabRecorder, MecabReplay
+from pylib.output import fmt_jrp
+from pylib.preferences import Prefs
+from pylib.sqlite_dict import SqliteDict
+
+
+def load_dictionary(data_dir: str, lazy: bool = False) -> Dictionary:
+    dict_type = LazyDict if lazy else BasicDict
+    return Dictionary(dict_type(AccentEntry, os.path.join(data_dir, "accents.xz")),
+                      dict_type(VariantEntry, os.path.join(data_dir, "variants.xz")))
+
+
+def bench_memory(args: List[str]):
+    tracemalloc.start()
+    start = time.perf_counter()
+    dic = load_dictionary(args[0], "lazy" in args[1:])
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    acc_readings = sum(1 for _ in dic.accent.reading_keys())
+    var_readings = sum(1 for _ in dic.variant.reading_keys())
+    print(f"dictionary: {acc_readings} accent readings, {var_readings} variant readings")
+    print(f"load time (traced): {elapsed:.2f}s")
+    print(f"allocated: {current / 2 ** 20:.1f} MiB, peak: {peak / 2 ** 20:.1f} MiB")
+
+
+def bench_load(args: List[str]):
+    def load(filename: str, entry_t, executor: Optional[Executor]) -> float:
+        start = time.perf_counter()
+        bdict = BasicDict(entry_t, os.path.join(args[0], filename), executor=executor)
+        elapsed = time.perf_counter() - start
+        phases = ", ".join(f"{phase} {secs:.2f}s" for phase, secs in bdict.timings.items())
+        print(f"  {filename}: {elapsed:.2f}s ({phases})")
+        return elapsed
+
+    files = [("accents.xz", AccentEntry), ("variants.xz", VariantEntry)]
+
+    print("sequential:")
+    start = time.perf_counter()
+    for filename, entry_t in files:
+        load(filename, entry_t, None)
+    print(f"  total: {time.perf_counter() - start:.2f}s")
+
+    print(f"parallel ({os.cpu_count()} workers):")
+    start = time.perf_counter()
+    with ProcessPoolExecutor() as parse_executor, ThreadPoolExecutor(len(files)) as file_executor:
+        futures = [file_executor.submit(load, filename, entry_t, parse_executor) for filename, entry_t in files]
+        for future in futures:
+            future.result()
+    print(f"  total: {time.perf_counter() - start:.2f}s")
+
+
+def _rss_mib() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as fd:
+            return int(fd.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return None
+
+
+def _open_backend(backend: str, data_dir: str) -> Dictionary:
+    if backend == "sqlite":
+        def path(name: str, ext: str) -> str:
+            return os.path.join(data_dir, f"{name}.{ext}")
+
+        return Dictionary(SqliteDict.open(AccentEntry, path("accents", "xz"), path("accents", "sqlite")),
+                          SqliteDict.open(VariantEntry, path("variants", "xz"), path("variants", "sqlite")))
+    return load_dictionary(data_dir)
+
+
+def _bench_backend(backend: str, data_dir: str, words: List[str]) -> Tuple[float, List[float], Optional[float]]:
+    start = time.perf_counter()
+    dic = _open_backend(backend, data_dir)
+    load_time = time.perf_counter() - start
+    # measure the backends themselves, not the lookup cache in front of them
+    dic.cache.resize(0)
+    latencies = []
+    for word in words:
+        start = time.perf_counter()
+        dic.look_up(word)
+        latencies.append(time.perf_counter() - start)
+    return load_time, latencies, _rss_mib()
+
+
+def bench_sqlite(args: List[str]):
+    data_dir = args[0]
+    print("building SQLite databases if necessary...")
+    keys_dic = _open_backend("sqlite", data_dir)
+    keys = sorted(set(keys_dic._variant_keys()).union(keys_dic._reading_keys()))
+    words = random.Random(0).choices(keys, k=20000)
+
+    # every backend runs in a fresh process so that the RSS of one doesn't affect the other
+    for backend in ("memory", "sqlite"):
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            load_time, latencies, rss = executor.submit(_bench_backend, backend, data_dir, words).result()
+        latencies.sort()
+        print(f"{backend}:")
+        print(f"  load: {load_time:.2f}s, RSS: {f'{rss:.1f} MiB' if rss is not None else 'n/a'}")
+        print(f"  lookup: mean {statistics.mean(latencies) * 1e6:.1f}µs, "
+              f"median {latencies[len(latencies) // 2] * 1e6:.1f}µs, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.1f}µs")
+
+
+def bench_batch(args: List[str]):
+    dic = load_dictionary(args[0])
+    dic.build_resolution_table()
+
+    # word frequencies in real text roughly follow Zipf's law, so batches contain lots of repeated tokens
+    rnd = random.Random(0)
+    keys = sorted(set(dic._variant_keys()))
+    vocab = rnd.sample(keys, 2000)
+    weights = [1 / (i + 1) for i in range(len(vocab))]
+    # text also contains words that aren't in the dictionary, which are looked up repeatedly just like known ones
+    key_set = set(keys)
+    misses = [word for word in ("".join(rnd.sample(word, len(word))) + "ゑ" for word in vocab[:200])
+              if word not in key_set]
+    batch = []
+    for word in rnd.choices(vocab, weights, k=5000):
+        if rnd.random() < 0.1:
+            batch.append((rnd.choice(misses), None))
+        entries = dic.accent.look_up_variant(word) or dic.variant.look_up_variant(word)
+        guess = rnd.choice(entries).reading if entries and rnd.random() < 0.5 else None
+        batch.append((word, guess))
+    print(f"batch: {len(batch)} tokens, {len(set(batch))} distinct")
+
+    def run_loop():
+        return [dic.look_up(word, guess) for word, guess in batch]
+
+    def run_batch():
+        return dic.look_up_many(batch)
+
+    # each order also checks the results the first one left in the cache
+    for first, second in ((run_loop, run_batch), (run_batch, run_loop)):
+        dic.cache.clear()
+        if [repr(lu) for lu in first()] != [repr(lu) for lu in second()]:
+            sys.exit("results differ")
+    dic.cache.clear()
+    if [repr(lu) for lu in run_batch()] != [repr(lu) for lu in run_batch()]:
+        sys.exit("results differ")
+
+    for name, func in (("look_up loop", run_loop), ("look_up_many", run_batch)):
+        times = []
+        for _ in range(20):
+            dic.cache.clear()
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        print(f"{name}: median {statistics.median(times) * 1e3:.2f}ms")
+
+
+def bench_parse(args: List[str]):
+    # input is MeCab output with one of the add-on's node formats, e.g. from running mecab on a text file
+    compact = "compact" in args[1:]
+    with (lzma.open if args[0].endswith(".xz") else open)(args[0], "rt", encoding="utf-8") as fd:
+        lines = [line for line in fd.read().splitlines() if line and line != "EOS"]
+    print(f"{len(lines)} nodes")
+
+    times = []
+    for _ in range(5):
+        start = time.perf_counter()
+        units = [MecabUnit.from_line(line, compact)[0] for line in lines]
+        times.append(time.perf_counter() - start)
+    print(f"from_line: best {min(times):.2f}s, {min(times) / len(lines) * 1e6:.2f}µs per node")
+
+    start = time.perf_counter()
+    for unit in units:
+        unit.hinsi_type()
+    print(f"hinsi_type: {(time.perf_counter() - start) / len(units) * 1e9:.0f}ns per call")
+
+
+def bench_record(args: List[str]):
+    with open(args[0], encoding="utf-8") as fd:
+        lines = fd.read().splitlines()
+    recorder = MecabRecorder(Mecab(*args[2:4]), args[1])
+    start = time.perf_counter()
+    try:
+        for i in range(0, len(lines), 1000):
+            recorder.analyze_many(lines[i:i + 1000])
+    finally:
+        recorder.close()
+    print(f"recorded {len(set(lines))} lines in {time.perf_counter() - start:.2f}s")
+
+
+def bench_convert(args: List[str]):
+    dic = load_dictionary(args[0])
+    dic.build_resolution_table()
+    replay = MecabReplay(args[1])
+    lines = replay.lines()
+    prefs = Prefs()
+    print(f"{len(lines)} lines")
+
+    phases: Dict[str, List[float]] = {"analyze": [], "convert": [], "output": []}
+    for _ in range(5):
+        dic.cache.clear()
+        start = time.perf_counter()
+        parsed = replay.analyze_many(lines)
+        phases["analyze"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        converted = [convert(punits, prefs.convert, dic) for punits in parsed]
+        phases["convert"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        for units in converted:
+            fmt_jrp(units, prefs.output)
+        phases["output"].append(time.perf_counter() - start)
+    for phase, times in phases.items():
+        print(f"{phase}: median {statistics.median(times):.2f}s, "
+              f"{statistics.median(times) / len(lines) * 1e6:.1f}µs per line")
+
+
+commands: Dict[str, Tuple[Callable[[List[str]], None], str]] = {
+    "memory": (bench_memory, "<DATA DIR> [lazy]"),
+    "load": (bench_load, "<DATA DIR>"),
+    "sqlite": (bench_sqlite, "<DATA DIR>"),
+    "batch": (bench_batch, "<DATA DIR>"),
+    "parse": (bench_parse, "<MECAB OUTPUT> [compact]"),
+    "record": (bench_record, "<TEXT FILE> <RECORDING> [MECAB EXE] [DICT DIR]"),
+    "convert": (bench_convert, "<DATA DIR> <RECORDING>"),
+}
+
+# worker processes re-import this module, which must not run a benchmark again
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in commands:
+        sys.exit("usage:\n" + "\n".join(f"  ./benchmark.py {name} {usage}" for name, (_, usage) in commands.items()))
+
+    commands[sys.argv[1]][0](sys.argv[2:])
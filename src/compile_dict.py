@@ -0,0 +1,13 @@
+#!/bin/python
+# This project is licensed under the terms of the GNU GPL v3: https://www.gnu.org/licenses/; © 2022 Ben Kerman
+import os
+import sys
+
+from pylib.compiled_dict import compile_dict
+from pylib.dictionary import AccentEntry, VariantEntry
+
+if len(sys.argv) != 2:
+    sys.exit("invalid number of arguments; usage: ./compile_dict.py <DATA DIR>")
+
+for name, entry_type in (("accents", AccentEntry), ("variants", VariantEntry)):
+    compile_dict(entry_type, os.path.join(sys.argv[1], f"{name}.xz"), os.path.join(sys.argv[1], f"{name}.jrpd"))
@@ -109,8 +109,7 @@ for src_path in sys.argv[2:]:
         same_reading = readings.setdefault(entry.reading, [])
         if same_accent := next((e for e in same_reading if set(entry.accents) == set(e.accents)), None):
             if entry.variants[0] not in same_accent.variants:
-                same_accent.variants.extend(entry.variants)
-                same_accent.variants.sort()
+                same_accent.variants = tuple(sorted(same_accent.variants + entry.variants))
             same_accent.sources.extend(set(entry.sources) - set(same_accent.sources))
             same_accent.sources.sort()
         else:
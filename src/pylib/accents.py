@@ -1,6 +1,6 @@
 # This project is licensed under the terms of the GNU GPL v3: https://www.gnu.org/licenses/; © 2022 Ben Kerman
 from dataclasses import dataclass
-from typing import Any, List, Optional, Tuple, Union
+from typing import Any, ClassVar, Dict, List, Optional, Tuple, Union
 
 from .normalize import split_moras
 from .util import ConfigError
@@ -8,12 +8,18 @@ from .util import ConfigError
 
 @dataclass
 class Accent:
+    __slots__ = ("value",)
     value: Optional[Union[int, List[Tuple[int, int]]]]
 
     default = False
+    # instances with a plain downstep value are shared, the vast majority of dictionary entries uses one of a handful
+    _shared: ClassVar[Dict[str, "Accent"]] = {}
 
     @classmethod
     def from_str(cls, val: str, mora_count: Optional[int] = None) -> "Accent":
+        if shared := cls._shared.get(val):
+            return shared
+
         def parse_part(v: str) -> Tuple[int, Optional[int]]:
             split = v.split("@")
             if len(split) == 1:
@@ -24,7 +30,7 @@ class Accent:
                 raise ValueError
 
         if val == "?":
-            return Accent(None)
+            return cls._shared.setdefault(val, Accent(None))
 
         part_strs = val.split("-")
         if len(part_strs) > 1:
@@ -42,7 +48,7 @@ class Accent:
 
             return Accent(parts)
         else:
-            return Accent(int(val))
+            return cls._shared.setdefault(val, Accent(int(val)))
 
     @classmethod
     def from_list(cls, lst: list) -> "Accent":
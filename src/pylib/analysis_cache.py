@@ -0,0 +1,196 @@
+# This project is licensed under the terms of the GNU GPL v3: https://www.gnu.org/licenses/; © 2022 Ben Kerman
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from .mecab import MecabUnit, ParserUnit, Tokenizer
+from .util import LRUCache
+
+# changing how units are stored invalidates all cached analyses
+_FORMAT_VERSION = 1
+# maximum number of parameters in a query is 999 for older SQLite versions
+_QUERY_CHUNK_SIZE = 500
+
+_schema = """
+CREATE TABLE IF NOT EXISTS analyses (
+    fingerprint TEXT NOT NULL,
+    line TEXT NOT NULL,
+    units TEXT NOT NULL,
+    used INTEGER NOT NULL,
+    PRIMARY KEY (fingerprint, line)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS analyses_used ON analyses (used);
+"""
+
+_dic_files = ("sys.dic", "unk.dic", "matrix.bin", "char.bin", "dicrc")
+
+
+def fingerprint(exe_path: Optional[str], dic_dir: Optional[str]) -> str:
+    # when the dictionary compiled into the executable is used, only the executable identifies it
+    paths = [exe_path or shutil.which("mecab") or "mecab"]
+    if dic_dir:
+        paths.extend(os.path.join(dic_dir, name) for name in _dic_files)
+
+    parts = [str(_FORMAT_VERSION)]
+    for path in paths:
+        try:
+            st = os.stat(path)
+            parts.append(f"{path}:{st.st_size}:{st.st_mtime_ns}")
+        except OSError:
+            parts.append(f"{path}:-")
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _encode(units: Sequence[ParserUnit]) -> str:
+    return json.dumps([
+        [u.value, u.hinsi, u.hinsi_class_1, u.hinsi_class_2, u.hinsi_class_3, u.conj_type, u.conj_form,
+         u.base_form, u.reading, u.pronunciation] if isinstance(u, MecabUnit) else u.value
+        for u in units
+    ], ensure_ascii=False, separators=(",", ":"))
+
+
+def _decode(data: str) -> List[ParserUnit]:
+    return [ParserUnit(u) if isinstance(u, str) else MecabUnit(*u) for u in json.loads(data)]
+
+
+def _chunks(items: Sequence[str]) -> Iterable[Sequence[str]]:
+    return (items[i:i + _QUERY_CHUNK_SIZE] for i in range(0, len(items), _QUERY_CHUNK_SIZE))
+
+
+class AnalysisCache:
+    fingerprint: str
+    disk_size: int
+    disk_hits: int
+    disk_misses: int
+    _memory: LRUCache[str, List[ParserUnit]]
+    _con: Optional[sqlite3.Connection]
+    _lock: threading.Lock
+
+    def __init__(self, fingerprint: str, memory_size: int, db_path: Optional[str] = None, disk_size: int = 0):
+        self.fingerprint = fingerprint
+        self.disk_size = disk_size
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self._memory = LRUCache(memory_size)
+        self._con = None
+        self._lock = threading.Lock()
+
+        if db_path and disk_size > 0:
+            try:
+                self._con = sqlite3.connect(db_path, check_same_thread=False)
+                self._con.executescript(_schema)
+            except sqlite3.Error as e:
+                print(f"analysis cache unavailable: {e}")
+                self.close()
+
+    def close(self):
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+
+    def _load(self, lines: Sequence[str]) -> Dict[str, str]:
+        rows = {}
+        with self._lock, self._con:
+            for chunk in _chunks(lines):
+                params = (self.fingerprint, *chunk)
+                rows.update(self._con.execute(f"SELECT line, units FROM analyses WHERE fingerprint = ? "
+                                              f"AND line IN ({','.join('?' * len(chunk))})", params))
+            self._con.executemany("UPDATE analyses SET used = ? WHERE fingerprint = ? AND line = ?",
+                                  ((int(time.time()), self.fingerprint, line) for line in rows))
+        return rows
+
+    def get_many(self, lines: Iterable[str]) -> Dict[str, List[ParserUnit]]:
+        found = {}
+        missing = []
+        for line in dict.fromkeys(lines):
+            units = self._memory.get(line)
+            if units is None:
+                missing.append(line)
+            else:
+                found[line] = units
+
+        if missing and self._con is not None:
+            try:
+                rows = self._load(missing)
+            except sqlite3.Error as e:
+                print(f"reading from analysis cache failed: {e}")
+                rows = {}
+            self.disk_hits += len(rows)
+            self.disk_misses += len(missing) - len(rows)
+            for line, data in rows.items():
+                units = found[line] = _decode(data)
+                self._memory.put(line, units)
+        return found
+
+    def _store(self, results: Dict[str, List[ParserUnit]]):
+        now = int(time.time())
+        with self._lock, self._con:
+            self._con.executemany("INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?)",
+                                  ((self.fingerprint, line, _encode(units), now) for line, units in results.items()))
+            [(count,)] = self._con.execute("SELECT COUNT(*) FROM analyses")
+            # analyses made with a different MeCab setup are never used again and get evicted first
+            if count > self.disk_size:
+                self._con.execute("DELETE FROM analyses WHERE (fingerprint, line) IN ("
+                                  "SELECT fingerprint, line FROM analyses ORDER BY fingerprint = ?, used LIMIT ?)",
+                                  (self.fingerprint, count - self.disk_size))
+
+    def put_many(self, results: Dict[str, List[ParserUnit]]):
+        for line, units in results.items():
+            self._memory.put(line, units)
+        if results and self._con is not None:
+            try:
+                self._store(results)
+            except sqlite3.Error as e:
+                print(f"writing to analysis cache failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "memory": {
+                "size": len(self._memory),
+                "max_size": self._memory.max_size,
+                "hits": self._memory.hits,
+                "misses": self._memory.misses,
+                "evictions": self._memory.evictions,
+            }
+        }
+        if self._con is not None:
+            with self._lock:
+                [(size,)] = self._con.execute("SELECT COUNT(*) FROM analyses")
+            stats["disk"] = {
+                "size": size,
+                "max_size": self.disk_size,
+                "hits": self.disk_hits,
+                "misses": self.disk_misses,
+            }
+        return stats
+
+
+class CachedMecab(Tokenizer):
+    mecab: Tokenizer
+    cache: AnalysisCache
+
+    def __init__(self, mecab: Tokenizer, cache: AnalysisCache):
+        self.mecab = mecab
+        self.cache = cache
+
+    def close(self):
+        self.mecab.close()
+        self.cache.close()
+
+    def analyze(self, txt: str) -> List[ParserUnit]:
+        return self.analyze_many([txt])[0]
+
+    def analyze_many(self, lines: Sequence[str]) -> List[List[ParserUnit]]:
+        found = self.cache.get_many(lines)
+        missing = [line for line in dict.fromkeys(lines) if line not in found]
+        if missing:
+            results = dict(zip(missing, self.mecab.analyze_many(missing)))
+            self.cache.put_many(results)
+            found.update(results)
+        return [found[line] for line in lines]
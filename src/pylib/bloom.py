@@ -0,0 +1,52 @@
+# This project is licensed under the terms of the GNU GPL v3: https://www.gnu.org/licenses/; © 2022 Ben Kerman
+import math
+from typing import Iterable
+
+_mask32 = (1 << 32) - 1
+
+
+class BloomFilter:
+    _bits: bytearray
+    _bit_count: int
+    _hash_count: int
+    key_count: int
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self._bit_count = max(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self._hash_count = max(round(self._bit_count / capacity * math.log(2)), 1)
+        self._bits = bytearray((self._bit_count + 7) // 8)
+        self.key_count = 0
+
+    @classmethod
+    def from_keys(cls, keys: Iterable[str], error_rate: float = 0.01) -> "BloomFilter":
+        keys = set(keys)
+        bloom = cls(len(keys), error_rate)
+        for key in keys:
+            bloom.add(key)
+        return bloom
+
+    def _positions(self, key: str) -> Iterable[int]:
+        # str hashes are cached on the object, so deriving all positions from one hash is almost free
+        h = hash(key)
+        h1 = h & _mask32
+        h2 = (h >> 32 & _mask32) | 1
+        for i in range(self._hash_count):
+            yield (h1 + i * h2) % self._bit_count
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.key_count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & 1 << (pos & 7) for pos in self._positions(key))
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._bits)
+
+    @property
+    def false_positive_rate(self) -> float:
+        return (1 - math.exp(-self._hash_count * self.key_count / self._bit_count)) ** self._hash_count
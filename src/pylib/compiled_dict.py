@@ -0,0 +1,254 @@
+# This project is licensed under the terms of the GNU GPL v3: https://www.gnu.org/licenses/; © 2022 Ben Kerman
+import lzma
+import mmap
+import os
+import struct
+import weakref
+import zlib
+from typing import Any, Dict, Generic, Iterable, List, Optional, Sequence, TextIO, Tuple, Type, TypeVar, Union
+
+from .dict_snapshot import source_key
+from .normalize import to_hiragana
+from .util import deep_size
+
+T = TypeVar("T")
+
+# layout: header, entry table, variant index, reading index, postings, string pool
+# all offsets are relative to the start of the file, strings are stored as UTF-8 in the pool
+# the header ends with the location of the key of the source file in the pool, which is empty for shared memory
+_MAGIC = b"JRPD"
+_VERSION = 3
+_header = struct.Struct("<4sIIIIIIIIIII")
+_entry = struct.Struct("<II")
+_slot = struct.Struct("<IIII")
+_posting = struct.Struct("<I")
+
+
+class CompiledDictError(Exception):
+    pass
+
+
+def _source_key(entry_type: Type[T], src_path: str) -> str:
+    return repr(source_key(src_path, _VERSION, entry_type.__name__))
+
+
+def _hash(key: bytes) -> int:
+    return zlib.crc32(key)
+
+
+def _slot_count(key_count: int) -> int:
+    count = 8
+    while count < key_count * 2:
+        count *= 2
+    return count
+
+
+def _build_index(table: Dict[str, List[int]], slot_count: int, pool: bytearray, postings: bytearray,
+                 postings_off: int) -> bytes:
+    slots: List[Optional[Tuple[int, int, int, int]]] = [None] * slot_count
+    mask = slot_count - 1
+    for key, entry_ids in table.items():
+        # an empty slot is one without postings, a key without any would just take up room
+        if not entry_ids:
+            continue
+        key_bytes = key.encode("utf-8")
+        key_off = len(pool)
+        pool += key_bytes
+        post_off = postings_off + len(postings)
+        for entry_id in entry_ids:
+            postings += _posting.pack(entry_id)
+
+        i = _hash(key_bytes) & mask
+        while slots[i] is not None:
+            i = (i + 1) & mask
+        slots[i] = (key_off, len(key_bytes), post_off, len(entry_ids))
+
+    return b"".join(_slot.pack(*slot) if slot else _slot.pack(0, 0, 0, 0) for slot in slots)
+
+
+def compile_entries(lines: Sequence[str], entries: Sequence, source: str = "") -> bytes:
+    variants: Dict[str, List[int]] = {}
+    readings: Dict[str, List[int]] = {}
+    for i, entry in enumerate(entries):
+        readings.setdefault(entry.norm_reading, []).append(i)
+        for var in entry.variants:
+            variants.setdefault(var, []).append(i)
+    return _pack(lines, variants, readings, source)
+
+
+def compile_backend(backend) -> bytes:
+    # works with every dictionary backend, the entry ids are assigned in the order the entries are encountered
+    entries: List = []
+    ids: Dict[int, int] = {}
+
+    def entry_ids(found: Optional[Sequence]) -> List[int]:
+        res = []
+        for entry in found or ():
+            entry_id = ids.get(id(entry))
+            if entry_id is None:
+                entry_id = ids[id(entry)] = len(entries)
+                entries.append(entry)
+            res.append(entry_id)
+        return res
+
+    variants = {key: entry_ids(backend.look_up_variant(key)) for key in backend.variant_keys()}
+    readings = {key: entry_ids(backend.look_up_reading(key)) for key in backend.reading_keys()}
+    return _pack([entry.to_line() for entry in entries], variants, readings)
+
+
+def _pack(lines: Sequence[str], variants: Dict[str, List[int]], readings: Dict[str, List[int]],
+          source: str = "") -> bytes:
+    pool = bytearray()
+    entry_tbl = bytearray()
+    for line in lines:
+        line_bytes = line.encode("utf-8")
+        entry_tbl += _entry.pack(len(pool), len(line_bytes))
+        pool += line_bytes
+
+    var_slots = _slot_count(len(variants))
+    read_slots = _slot_count(len(readings))
+    entries_off = _header.size
+    var_idx_off = entries_off + len(entry_tbl)
+    read_idx_off = var_idx_off + var_slots * _slot.size
+    postings_off = read_idx_off + read_slots * _slot.size
+
+    postings = bytearray()
+    var_idx = _build_index(variants, var_slots, pool, postings, postings_off)
+    read_idx = _build_index(readings, read_slots, pool, postings, postings_off)
+    pool_off = postings_off + len(postings)
+    source_off = len(pool)
+    pool += source.encode("utf-8")
+
+    header = _header.pack(_MAGIC, _VERSION, len(lines), var_slots, read_slots, entries_off, var_idx_off,
+                          read_idx_off, postings_off, pool_off, source_off, len(pool) - source_off)
+    return b"".join((header, entry_tbl, var_idx, read_idx, postings, pool))
+
+
+def compile_dict(entry_type: Type[T], src_path: str, tgt_path: str):
+    lines = []
+    entries = []
+    fd: TextIO
+    with lzma.open(src_path, "rt", encoding="utf-8") as fd:
+        for line in (rl.rstrip("\r\n") for rl in fd):
+            if line.startswith("#"):
+                continue
+
+            try:
+                entries.append(entry_type.from_line(line))
+                lines.append(line)
+            except ValueError:
+                print(f"skipping invalid dict entry: {line}")
+
+    data = compile_entries(lines, entries, _source_key(entry_type, src_path))
+    # running instances have the old file mapped, overwriting it in place would pull the data out from under them
+    tmp_path = f"{tgt_path}.tmp"
+    try:
+        with open(tmp_path, "wb") as fd:
+            fd.write(data)
+        os.replace(tmp_path, tgt_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class CompiledDict(Generic[T]):
+    _entry_type: Type[T]
+    _buf: Union[mmap.mmap, memoryview]
+    _entries: Dict[int, T]
+    _finalizer: weakref.finalize
+
+    # source is either the path of a compiled file or a buffer holding the same data, e.g. in shared memory
+    def __init__(self, entry_type: Type[T], source: Union[str, memoryview]):
+        self._entry_type = entry_type
+        self._entries = {}
+
+        # dictionaries that are replaced on reload are never closed explicitly, they might still be in use
+        if isinstance(source, memoryview):
+            self._buf = source
+            self._finalizer = weakref.finalize(self, source.release)
+            path = "<buffer>"
+        else:
+            with open(source, "rb") as fd:
+                self._buf = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+            self._finalizer = weakref.finalize(self, self._buf.close)
+            path = source
+
+        if len(self._buf) < _header.size:
+            raise CompiledDictError(f"file too short: {path}")
+        magic, version = _header.unpack_from(self._buf)[:2]
+        if magic != _MAGIC:
+            raise CompiledDictError(f"not a compiled dictionary: {path}")
+        if version != _VERSION:
+            raise CompiledDictError(f"unsupported compiled dictionary version {version}: {path}")
+        _, _, self._entry_count, self._var_slots, self._read_slots, self._entries_off, self._var_idx_off, \
+            self._read_idx_off, _, self._pool_off, source_off, source_len = _header.unpack_from(self._buf)
+        start = self._pool_off + source_off
+        self._source = str(self._buf[start:start + source_len], "utf-8")
+
+    def close(self):
+        self._finalizer()
+
+    # whether the dictionary was compiled from the current version of the source file
+    def is_current(self, src_path: str) -> bool:
+        return self._source == _source_key(self._entry_type, src_path)
+
+    def _entry(self, entry_id: int) -> T:
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            line_off, line_len = _entry.unpack_from(self._buf, self._entries_off + entry_id * _entry.size)
+            start = self._pool_off + line_off
+            entry = self._entry_type.from_line(str(self._buf[start:start + line_len], "utf-8"))
+            # another thread might have parsed the same line in the meantime, all callers must get the same object
+            entry = self._entries.setdefault(entry_id, entry)
+        return entry
+
+    def _probe(self, idx_off: int, slot_count: int, key: str) -> Optional[List[T]]:
+        key_bytes = key.encode("utf-8")
+        mask = slot_count - 1
+        i = _hash(key_bytes) & mask
+        while True:
+            key_off, key_len, post_off, post_count = _slot.unpack_from(self._buf, idx_off + i * _slot.size)
+            if not post_count:
+                return None
+            if key_len == len(key_bytes):
+                start = self._pool_off + key_off
+                if self._buf[start:start + key_len] == key_bytes:
+                    ids = struct.unpack_from(f"<{post_count}I", self._buf, post_off)
+                    return [self._entry(entry_id) for entry_id in ids]
+            i = (i + 1) & mask
+
+    def _keys(self, idx_off: int, slot_count: int) -> Iterable[str]:
+        for i in range(slot_count):
+            key_off, key_len, _, post_count = _slot.unpack_from(self._buf, idx_off + i * _slot.size)
+            if post_count:
+                start = self._pool_off + key_off
+                yield str(self._buf[start:start + key_len], "utf-8")
+
+    def look_up_variant(self, val: str) -> Optional[List[T]]:
+        return self._probe(self._var_idx_off, self._var_slots, val)
+
+    def look_up_reading(self, val: str) -> Optional[List[T]]:
+        return self._probe(self._read_idx_off, self._read_slots, to_hiragana(val))
+
+    def variant_keys(self) -> Iterable[str]:
+        return self._keys(self._var_idx_off, self._var_slots)
+
+    def reading_keys(self) -> Iterable[str]:
+        return self._keys(self._read_idx_off, self._read_slots)
+
+    def _key_count(self, idx_off: int, slot_count: int) -> int:
+        return sum(1 for i in range(slot_count) if _slot.unpack_from(self._buf, idx_off + i * _slot.size)[3])
+
+    def stats(self, memory: bool = False) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "entries": self._entry_count,
+            "materialized_entries": len(self._entries),
+            "variant_keys": self._key_count(self._var_idx_off, self._var_slots),
+            "reading_keys": self._key_count(self._read_idx_off, self._read_slots),
+        }
+        if hasattr(self._entry_type, "accents_invalid"):
+            stats["invalid_accents"] = sum(1 for e in list(self._entries.values()) if e.accents_invalid())
+        if memory:
+            stats["memory_bytes"] = {"mapped": len(self._buf), "entries": deep_size(self._entries)}
+        return stats
@@ -66,19 +66,22 @@ def find_longest_match(prefs: ConvPrefs, dic: Dictionary, idx: int, punits: Sequ
                        stop_cond: Callable[[int, MecabUnit], bool] = _dsc) -> Optional[Match]:
     acc_match: Optional[Match] = None
     plain_match: Optional[Match] = None
+    walk = dic.prefix_walk()
+    part_word = ""
+    part_reading: Optional[str] = ""
     for i in range(idx, len(punits)):
         pu = punits[i]
         if not isinstance(pu, MecabUnit) or stop_cond(i, pu):
             break
 
-        if all(isinstance(u, MecabUnit) and u.hinsi != "未知語" for u in punits[idx:i + 1]):
-            reading_guess = "".join(map(lambda u: u.reading, punits[idx:i]))
-            reading_guess += pu.base_reading() or pu.reading
+        if part_reading is not None and pu.hinsi != "未知語":
+            reading_guess = part_reading + (pu.base_reading() or pu.reading)
+            part_reading += pu.reading
         else:
-            reading_guess = None
-        part_word = "".join(map(lambda u: u.value, punits[idx:i]))
+            reading_guess = part_reading = None
         word = part_word + pu.value
         base_word = part_word + pu.base_form if pu.hinsi_type() == HinsiType.YOUGEN else None
+        part_word = word
 
         for var_word, var_guess, var_base in _lookup_variants(prefs, word, reading_guess, base_word):
             if lu := dic.look_up(var_word, var_guess):
@@ -89,6 +92,13 @@ def find_longest_match(prefs: ConvPrefs, dic: Dictionary, idx: int, punits: Sequ
                     plain_match = match
                 break
 
+        # every word looked up from here on either starts with the current one,
+        # or is its potential form base, which only differs in the last character
+        if walk and not walk.extend(word):
+            pot_prefix = word[:-1] + word[-1].translate(_potential_table)
+            if not (pot_prefix != word and walk.can_extend(pot_prefix) or prefs.has_word_or_prefix(word)):
+                break
+
     def find_retval(prefs: ConvPrefs, acc: Match, plain: Match) -> Match:
         if acc:
             if prefs.prefer_accent_lookups:
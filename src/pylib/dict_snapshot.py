@@ -0,0 +1,57 @@
+# This project is licensed under the terms of the GNU GPL v3: https://www.gnu.org/licenses/; © 2022 Ben Kerman
+import gc
+import hashlib
+import os
+import pickle
+import threading
+from typing import Any, Hashable, Optional, Tuple
+
+SnapshotKey = Tuple[Hashable, ...]
+
+
+def source_key(src_path: str, *extra: Hashable) -> SnapshotKey:
+    stat = os.stat(src_path)
+    sha = hashlib.sha256()
+    with open(src_path, "rb") as fd:
+        while chunk := fd.read(1 << 20):
+            sha.update(chunk)
+    return (*extra, stat.st_size, stat.st_mtime_ns, sha.hexdigest())
+
+
+def load_snapshot(path: str, key: SnapshotKey) -> Optional[Any]:
+    if not os.path.exists(path):
+        return None
+
+    # the cyclic GC would otherwise run many times while the entries are created, slowing loading down considerably
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, "rb") as fd:
+            if pickle.load(fd) != key:
+                return None
+            return pickle.load(fd)
+    except Exception as e:
+        print(f"failed to load snapshot {path}: {e}")
+        return None
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def write_snapshot(path: str, key: SnapshotKey, data: Any):
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "wb") as fd:
+            pickle.dump(key, fd, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, fd, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"failed to write snapshot {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_snapshot_async(path: str, key: SnapshotKey, data: Any) -> threading.Thread:
+    thread = threading.Thread(target=write_snapshot, args=(path, key, data), daemon=True)
+    thread.start()
+    return thread
@@ -1,74 +1,415 @@
 # This project is licensed under the terms of the GNU GPL v3: https://www.gnu.org/licenses/; © 2022 Ben Kerman
 import lzma
+import os
 import sys
-from dataclasses import dataclass
-from typing import Dict, Generic, Iterable, List, Optional, Sequence, TextIO, Type, TypeVar
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from itertools import chain, repeat
+from typing import Any, Dict, Generic, Iterable, List, Optional, Sequence, Set, TextIO, Tuple, Type, TypeVar, Union
 
 from .accents import Accent
-from .normalize import is_kana, to_hiragana
+from .bloom import BloomFilter
+from .compiled_dict import CompiledDict
+from .dict_snapshot import load_snapshot, source_key, write_snapshot_async
+from .normalize import is_kana, norm_reading, to_hiragana
+from .prefix_index import PrefixIndex, PrefixWalk
+from .sqlite_dict import SqliteDict
+from .util import LRUCache, deep_size, format_stats
 
 T = TypeVar("T")
 
+_uncached = object()
+
+# increment whenever the attributes of AccentEntry or VariantEntry or the snapshot contents change to invalidate
+# existing snapshots
+ENTRY_FORMAT_VERSION = 5
+
+# lines per task when parsing through an executor
+_chunk_size = 20000
+
+
+# user dictionaries are plain text files, the shipped ones are compressed
+def _open_text(path: str) -> TextIO:
+    return lzma.open(path, "rt", encoding="utf-8") if path.endswith(".xz") else open(path, encoding="utf-8")
+
+
+def _parse_lines(entry_type: Type[T], lines: Sequence[str]) -> Tuple[List[T], List[str]]:
+    entries = []
+    invalid = []
+    for line in lines:
+        if line.startswith("#"):
+            continue
+
+        try:
+            entries.append(entry_type.from_line(line))
+        except ValueError:
+            invalid.append(line)
+    return entries, invalid
+
 
 class BasicDict(Generic[T]):
+    _entry_type: Type[T]
     _readings: Dict[str, List[T]]
     _variants: Dict[str, List[T]]
+    timings: Dict[str, float]
+    invalid_lines: int
 
-    def __init__(self, entry_type: Type[T], path):
+    def __init__(self, entry_type: Type[T], path, snapshot_path: Optional[str] = None,
+                 executor: Optional[Executor] = None):
+        self._entry_type = entry_type
         self.variants = {}
         self.readings = {}
+        self.timings = {}
+        self.invalid_lines = 0
+
+        snap_key = None
+        if snapshot_path:
+            start = time.perf_counter()
+            snap_key = source_key(path, ENTRY_FORMAT_VERSION, entry_type.__name__)
+            snapshot = load_snapshot(snapshot_path, snap_key)
+            self.timings["snapshot"] = time.perf_counter() - start
+            if snapshot:
+                self.variants, self.readings, self.invalid_lines = snapshot
+                return
+
+        start = time.perf_counter()
+        fd: TextIO
+        with _open_text(path) as fd:
+            lines = fd.read().split("\n")
+        if lines and not lines[-1]:
+            lines.pop()
+        self.timings["decompress"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if executor:
+            chunks = [lines[i:i + _chunk_size] for i in range(0, len(lines), _chunk_size)]
+            results = list(executor.map(_parse_lines, repeat(entry_type), chunks))
+        else:
+            results = [_parse_lines(entry_type, lines)]
+        self.timings["parse"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for entries, invalid in results:
+            for line in invalid:
+                print(f"skipping invalid dict entry: {line}")
+            self.invalid_lines += len(invalid)
+            for entry in entries:
+                if executor:
+                    # entries parsed in another process arrive with their own copies of all strings
+                    entry.intern()
+                entry_type.dict_insert(self, entry)
+        self.timings["index"] = time.perf_counter() - start
+
+        if snapshot_path:
+            write_snapshot_async(snapshot_path, snap_key, (self.variants, self.readings, self.invalid_lines))
 
+    def look_up_variant(self, val: str) -> Optional[List[T]]:
+        return self.variants.get(val)
+
+    def look_up_reading(self, val: str) -> Optional[List[T]]:
+        return self.readings.get(to_hiragana(val))
+
+    def variant_keys(self) -> Iterable[str]:
+        return self.variants.keys()
+
+    def reading_keys(self) -> Iterable[str]:
+        return self.readings.keys()
+
+    def memory_usage(self) -> Dict[str, int]:
+        seen: Set[int] = set()
+        entries = [e for ents in self.readings.values() for e in ents]
+        usage = {
+            "readings": deep_size(self.readings, seen, (AccentEntry, VariantEntry)),
+            "variants": deep_size(self.variants, seen, (AccentEntry, VariantEntry)),
+            "entries": deep_size(entries, seen, (Accent,)) - sys.getsizeof(entries),
+        }
+        if entries and isinstance(entries[0], AccentEntry):
+            usage["accents"] = sum(deep_size(acc, seen) for e in entries if e.accents_parsed() for acc in e.accents)
+        return usage
+
+    def stats(self, memory: bool = False) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "entries": sum(len(ents) for ents in self.readings.values()),
+            "variant_keys": len(self.variants),
+            "reading_keys": len(self.readings),
+            "invalid_lines": self.invalid_lines,
+            "timings": dict(self.timings),
+        }
+        if issubclass(self._entry_type, AccentEntry):
+            stats["invalid_accents"] = _invalid_accents(e for ents in self.readings.values() for e in ents)
+        if memory:
+            stats["memory_bytes"] = self.memory_usage()
+        return stats
+
+
+# accents are only parsed when they are first accessed, entries that haven't been looked up yet aren't counted
+def _invalid_accents(entries: Iterable["AccentEntry"]) -> int:
+    return sum(1 for e in entries if e.accents_invalid())
+
+
+class LazyDict(Generic[T]):
+    _entry_type: Type[T]
+    _text: str
+    _variants: Dict[str, Union[int, List[int]]]
+    _readings: Dict[str, Union[int, List[int]]]
+    _entries: Dict[int, Optional[T]]
+    _line_count: int
+    timings: Dict[str, float]
+    invalid_lines: int
+
+    def __init__(self, entry_type: Type[T], path):
+        self._entry_type = entry_type
+        self._variants = {}
+        self._readings = {}
+        self._entries = {}
+        self._line_count = 0
+        self.timings = {}
+        self.invalid_lines = 0
+
+        start = time.perf_counter()
         fd: TextIO
         with lzma.open(path, "rt", encoding="utf-8") as fd:
-            for line in (rl.rstrip("\r\n") for rl in fd):
-                if line.startswith("#"):
-                    continue
-
+            self._text = fd.read()
+        self.timings["decompress"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        text = self._text
+        off = 0
+        while off < len(text):
+            end = text.find("\n", off)
+            if end == -1:
+                end = len(text)
+            line = text[off:end]
+            if not line.startswith("#"):
                 try:
-                    entry = entry_type.from_line(line)
-                    entry_type.dict_insert(self, entry)
+                    reading, variants = entry_type.line_keys(line)
                 except ValueError:
                     print(f"skipping invalid dict entry: {line}")
+                    self.invalid_lines += 1
+                else:
+                    self._line_count += 1
+                    self._add_key(self._readings, sys.intern(to_hiragana(reading)), off)
+                    for var in variants:
+                        self._add_key(self._variants, sys.intern(var), off)
+            off = end + 1
+        self.timings["index"] = time.perf_counter() - start
+
+    @staticmethod
+    def _add_key(table: Dict[str, Union[int, List[int]]], key: str, off: int):
+        # most keys belong to a single line, storing the bare offset for those saves a list per key
+        prev = table.get(key)
+        if prev is None:
+            table[key] = off
+        elif isinstance(prev, int):
+            table[key] = [prev, off]
+        else:
+            prev.append(off)
+
+    def _entry(self, off: int) -> Optional[T]:
+        try:
+            return self._entries[off]
+        except KeyError:
+            pass
+        end = self._text.find("\n", off)
+        line = self._text[off:end if end != -1 else len(self._text)]
+        try:
+            entry = self._entry_type.from_line(line)
+        except ValueError:
+            print(f"skipping invalid dict entry: {line}")
+            entry = None
+        # another thread might have parsed the same line in the meantime, all callers must get the same object
+        return self._entries.setdefault(off, entry)
+
+    def _look_up(self, table: Dict[str, Union[int, List[int]]], key: str) -> Optional[List[T]]:
+        offs = table.get(key)
+        if offs is None:
+            return None
+        entries = [self._entry(off) for off in ((offs,) if isinstance(offs, int) else offs)]
+        return [e for e in entries if e is not None] or None
 
     def look_up_variant(self, val: str) -> Optional[List[T]]:
-        return self.variants.get(val)
+        return self._look_up(self._variants, val)
 
     def look_up_reading(self, val: str) -> Optional[List[T]]:
-        return self.readings.get(to_hiragana(val))
+        return self._look_up(self._readings, to_hiragana(val))
+
+    def variant_keys(self) -> Iterable[str]:
+        return self._variants.keys()
+
+    def reading_keys(self) -> Iterable[str]:
+        return self._readings.keys()
+
+    def stats(self, memory: bool = False) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "entries": self._line_count,
+            "materialized_entries": len(self._entries),
+            "variant_keys": len(self._variants),
+            "reading_keys": len(self._readings),
+            "invalid_lines": self.invalid_lines,
+            "timings": dict(self.timings),
+        }
+        if issubclass(self._entry_type, AccentEntry):
+            stats["invalid_accents"] = _invalid_accents(e for e in list(self._entries.values()) if e)
+        if memory:
+            seen: Set[int] = set()
+            stats["memory_bytes"] = {
+                "text": deep_size(self._text, seen),
+                "readings": deep_size(self._readings, seen),
+                "variants": deep_size(self._variants, seen),
+                "entries": deep_size(self._entries, seen),
+            }
+        return stats
+
+
+class LayeredDict(Generic[T]):
+    base: Any
+    _entry_type: Type[T]
+    _layers: Dict[str, BasicDict[T]]
+
+    def __init__(self, entry_type: Type[T], base: Any):
+        self.base = base
+        self._entry_type = entry_type
+        self._layers = {}
+
+    def layers(self) -> Dict[str, BasicDict[T]]:
+        return self._layers
+
+    def copy(self) -> "LayeredDict[T]":
+        ldict = LayeredDict(self._entry_type, self.base)
+        ldict._layers = self._layers
+        return ldict
+
+    # layers from files that sort later take precedence, no matter in which order they were loaded
+    def load_layer(self, path: str) -> BasicDict[T]:
+        layer = BasicDict(self._entry_type, path)
+        layers = {**self._layers, path: layer}
+        self._layers = {p: layers[p] for p in sorted(layers, key=os.path.basename, reverse=True)}
+        return layer
+
+    def remove_layer(self, path: str):
+        self._layers = {p: lay for p, lay in self._layers.items() if p != path}
+
+    def _merge(self, found: Iterable[Optional[List[T]]]) -> Optional[List[T]]:
+        # entries from higher layers hide entries below them that have the same reading and share a variant
+        res = []
+        shadowed: Set[Tuple[str, str]] = set()
+        for entries in found:
+            if not entries:
+                continue
+            res.extend(e for e in entries if not any((e.norm_reading, var) in shadowed for var in e.variants))
+            shadowed.update((e.norm_reading, var) for e in entries for var in e.variants)
+        return res or None
+
+    def look_up_variant(self, val: str) -> Optional[List[T]]:
+        layers = self._layers.values()
+        return self._merge(chain((lay.look_up_variant(val) for lay in layers), (self.base.look_up_variant(val),)))
+
+    def look_up_reading(self, val: str) -> Optional[List[T]]:
+        layers = self._layers.values()
+        return self._merge(chain((lay.look_up_reading(val) for lay in layers), (self.base.look_up_reading(val),)))
+
+    def variant_keys(self) -> Iterable[str]:
+        return chain(*(lay.variant_keys() for lay in self._layers.values()), self.base.variant_keys())
+
+    def reading_keys(self) -> Iterable[str]:
+        return chain(*(lay.reading_keys() for lay in self._layers.values()), self.base.reading_keys())
+
+    def stats(self, memory: bool = False) -> Dict[str, Any]:
+        return {
+            "base": self.base.stats(memory),
+            "layers": {os.path.basename(path): lay.stats(memory) for path, lay in self._layers.items()},
+        }
 
 
 class AccentEntry:
+    __slots__ = ("reading", "norm_reading", "variants", "_accents", "__weakref__")
     reading: str
-    variants: List[str]
-    accents: List[Accent]
+    norm_reading: str
+    variants: Tuple[str, ...]
+    # the raw accent field from the dictionary file until the accents are first accessed
+    _accents: Union[str, Tuple[Accent, ...]]
 
-    def __init__(self, reading: str, variants: Iterable[str], accents: List[Accent]):
+    def __init__(self, reading: str, variants: Iterable[str], accents: Union[str, Iterable[Accent]]):
         self.reading = sys.intern(reading)
-        self.variants = [sys.intern(v) for v in variants]
-        self.accents = accents
+        self.norm_reading = sys.intern(to_hiragana(reading))
+        self.variants = tuple(sys.intern(v) for v in variants)
+        self._accents = accents if isinstance(accents, str) else tuple(accents)
+
+    @property
+    def accents(self) -> Tuple[Accent, ...]:
+        accents = self._accents
+        if isinstance(accents, str):
+            try:
+                accents = tuple(Accent.from_str(acc_str) for acc_str in accents.split(","))
+            except ValueError:
+                print(f"ignoring invalid accents of dict entry {self.reading}: {accents}")
+                accents = ()
+            self._accents = accents
+        return accents
+
+    def accents_parsed(self) -> bool:
+        return not isinstance(self._accents, str)
+
+    # entries whose accents fail to parse are kept and still match, just without accents
+    def accents_invalid(self) -> bool:
+        return self.accents_parsed() and not self._accents
+
+    def intern(self):
+        self.reading = sys.intern(self.reading)
+        self.norm_reading = sys.intern(self.norm_reading)
+        self.variants = tuple(sys.intern(v) for v in self.variants)
+
+    def to_line(self) -> str:
+        accents = self._accents if isinstance(self._accents, str) else ",".join(map(str, self._accents))
+        return f"{self.reading}\t{','.join(self.variants)}\t{accents}\t"
+
+    @classmethod
+    def line_keys(cls, line: str) -> Tuple[str, List[str]]:
+        vals = line.split("\t")
+        if len(vals) != 4:
+            raise ValueError
+        return vals[0], vals[1].split(",")
 
     @classmethod
     def from_line(cls, line: str) -> "AccentEntry":
         vals = line.split("\t")
         if len(vals) != 4:
             raise ValueError
-        accents = [Accent.from_str(acc_str) for acc_str in vals[2].split(",")]
-        return cls(vals[0], vals[1].split(","), accents)
+        return cls(vals[0], vals[1].split(","), vals[2])
 
     @classmethod
     def dict_insert(cls, bdict, entry):
-        bdict.readings.setdefault(entry.reading, []).append(entry)
+        bdict.readings.setdefault(entry.norm_reading, []).append(entry)
         for var in entry.variants:
             bdict.variants.setdefault(var, []).append(entry)
 
 
 class VariantEntry:
+    __slots__ = ("reading", "norm_reading", "variants", "__weakref__")
     reading: str
-    variants: List[str]
+    norm_reading: str
+    variants: Tuple[str, ...]
 
-    def __init__(self, reading: str, variants: List[str]):
-        self.variants = [sys.intern(v) for v in variants]
+    def __init__(self, reading: str, variants: Iterable[str]):
+        self.variants = tuple(sys.intern(v) for v in variants)
         self.reading = sys.intern(reading)
+        self.norm_reading = sys.intern(to_hiragana(reading))
+
+    def intern(self):
+        self.variants = tuple(sys.intern(v) for v in self.variants)
+        self.reading = sys.intern(self.reading)
+        self.norm_reading = sys.intern(self.norm_reading)
+
+    def to_line(self) -> str:
+        return f"{self.reading}\t{','.join(self.variants)}"
+
+    @classmethod
+    def line_keys(cls, line: str) -> Tuple[str, List[str]]:
+        vals = line.split("\t")
+        if len(vals) != 2:
+            raise ValueError
+        return vals[0], vals[1].split(",")
 
     @classmethod
     def from_line(cls, line: str) -> "VariantEntry":
@@ -79,20 +420,22 @@ class VariantEntry:
 
     @classmethod
     def dict_insert(cls, bdict, entry):
-        bdict.readings.setdefault(entry.reading, []).append(entry)
+        bdict.readings.setdefault(entry.norm_reading, []).append(entry)
         for var in entry.variants:
             bdict.variants.setdefault(var, []).append(entry)
 
 
-AccentDict = BasicDict[AccentEntry]
-VariantDict = BasicDict[VariantEntry]
+AccentDict = Union[BasicDict[AccentEntry], LazyDict[AccentEntry], CompiledDict[AccentEntry],
+                   SqliteDict[AccentEntry], LayeredDict[AccentEntry]]
+VariantDict = Union[BasicDict[VariantEntry], LazyDict[VariantEntry], CompiledDict[VariantEntry],
+                    SqliteDict[VariantEntry]]
 Entry = TypeVar("Entry", AccentEntry, VariantEntry)
 
 
 @dataclass
 class LookupResult:
     reading: str
-    accents: Optional[List[Accent]] = None
+    accents: Optional[Sequence[Accent]] = None
 
     def __repr__(self):
         return f"R[{self.reading},{self.accents}]"
@@ -114,61 +457,248 @@ class Lookup:
         return all(r.accents for r in self.results)
 
 
+@dataclass
+class Resolution:
+    __slots__ = ("entries", "by_variant", "uncertain")
+    entries: Sequence[Entry]
+    by_variant: bool
+    uncertain: bool
+
+
+def _check_uncertain(entrs: Sequence[Entry]) -> bool:
+    return any(e.reading == entrs[0].reading for e in entrs[1:])
+
+
 @dataclass
 class Dictionary:
     accent: AccentDict
     variant: VariantDict
+    cache: LRUCache[Tuple[str, Optional[str]], Optional[Lookup]] = \
+        field(default_factory=lambda: LRUCache(20000), repr=False)
+    _resolved: Optional[Dict[str, Resolution]] = field(default=None, init=False, repr=False)
+    _resolved_readings: Optional[Dict[str, Resolution]] = field(default=None, init=False, repr=False)
+    _prefixes: Optional[Tuple[PrefixIndex, PrefixIndex]] = field(default=None, init=False, repr=False)
+    _key_filter: Optional[BloomFilter] = field(default=None, init=False, repr=False)
+    _layer_keys: Optional[Set[str]] = field(default=None, init=False, repr=False)
+    timings: Dict[str, float] = field(default_factory=dict, init=False, repr=False)
 
     def _variant_lookup(self, word: str, as_reading: bool = False) -> Optional[List[AccentEntry]]:
         lu_fn = self.variant.look_up_reading if as_reading else self.variant.look_up_variant
-        res = []
+        res: Dict[AccentEntry, None] = {}
         var_ents = lu_fn(word)
         if not var_ents:
             return None
         for var in (var for ve in var_ents for var in ve.variants):
             acc_ents = self.accent.look_up_variant(var)
             if acc_ents:
-                res.extend(acc_ent for acc_ent in acc_ents if acc_ent not in res)
-        return res
-
-    def look_up(self, word: str, reading_guess: Optional[str] = None) -> Optional[Lookup]:
-        def filter_for_guess(entries: Iterable[Entry], guess: Optional[str]) -> Optional[List[Entry]]:
-            if not guess:
-                return None
-            return [e for e in entries if to_hiragana(e.reading) == to_hiragana(guess)]
-
-        def check_uncertain(entrs: Sequence[AccentEntry]) -> bool:
-            return any(e.reading == entrs[0].reading for e in entrs[1:])
+                res.update(dict.fromkeys(acc_ents))
+        return list(res)
 
-        word_direct_aent = self.accent.look_up_variant(word)
-        if word_direct_aent:
-            filtered_aent = filter_for_guess(word_direct_aent, reading_guess) or word_direct_aent
-            return Lookup(LookupResult.convert_entries(filtered_aent), check_uncertain(filtered_aent))
+    # the entry lists returned by the backends are used as they are, neither they nor resolutions are ever modified
+    def _resolve_variant(self, word: str) -> Optional[Resolution]:
+        aents = self.accent.look_up_variant(word) or self._variant_lookup(word)
+        return Resolution(aents, True, _check_uncertain(aents)) if aents else None
 
-        word_var_aent = self._variant_lookup(word)
-        if word_var_aent:
-            filtered_aent = filter_for_guess(word_var_aent, reading_guess) or word_var_aent
-            return Lookup(LookupResult.convert_entries(filtered_aent), check_uncertain(filtered_aent))
-
-        current_lu: Optional[Lookup] = None
+    def _resolve_reading(self, word: str) -> Optional[Resolution]:
         read_direct_aent = self.accent.look_up_reading(word)
-        if read_direct_aent:
-            current_lu = Lookup(LookupResult.convert_entries(read_direct_aent), len(read_direct_aent) > 1)
-            if not current_lu.uncertain:
-                return current_lu
-
+        if read_direct_aent and len(read_direct_aent) == 1:
+            return Resolution(read_direct_aent, False, False)
         read_var_aent = self._variant_lookup(word, as_reading=True)
         if read_var_aent:
-            current_lu = Lookup(LookupResult.convert_entries(read_var_aent), len(read_var_aent) > 1)
-            if not current_lu.uncertain:
-                return current_lu
-
-        if current_lu:
-            return current_lu
+            return Resolution(read_var_aent, False, len(read_var_aent) > 1)
+        if read_direct_aent:
+            return Resolution(read_direct_aent, False, True)
+        return None
 
+    def _resolve_bare(self, word: str) -> Optional[Resolution]:
         if not is_kana(word):
             word_direct_vent = self.variant.look_up_variant(word)
             if word_direct_vent:
-                return Lookup(LookupResult.convert_entries(word_direct_vent))
+                return Resolution(word_direct_vent, False, False)
+        return None
+
+    def _resolve(self, word: str) -> Optional[Resolution]:
+        return self._resolve_variant(word) or self._resolve_reading(word) or self._resolve_bare(word)
+
+    def _variant_keys(self) -> Iterable[str]:
+        return chain(self.accent.variant_keys(), self.variant.variant_keys())
+
+    def _reading_keys(self) -> Iterable[str]:
+        return chain(self.accent.reading_keys(), self.variant.reading_keys())
+
+    def build_resolution_table(self):
+        start = time.perf_counter()
+        reading_keys = set(self._reading_keys())
+        keys = reading_keys.union(self._variant_keys())
+        # most words resolve to the same entries as some other word, e.g. all variants of a single entry,
+        # those share one resolution instead of keeping their own copy
+        shared: Dict[tuple, Resolution] = {}
+
+        def share(res: Optional[Resolution]) -> Optional[Resolution]:
+            if res is None:
+                return None
+            return shared.setdefault((res.by_variant, res.uncertain, *map(id, res.entries)), res)
+
+        resolved_readings = {}
+        for key in reading_keys:
+            if res := share(self._resolve_reading(key)):
+                resolved_readings[key] = res
+        resolved = {}
+        for key in keys:
+            res = share(self._resolve_variant(key)) or resolved_readings.get(to_hiragana(key)) \
+                or share(self._resolve_bare(key))
+            if res:
+                resolved[key] = res
+        self._resolved_readings = resolved_readings
+        self._resolved = resolved
+        self.timings["resolution_table"] = time.perf_counter() - start
+
+    def build_prefix_index(self):
+        start = time.perf_counter()
+        variants = PrefixIndex(self._variant_keys())
+        readings = PrefixIndex(self._reading_keys())
+        self._prefixes = variants, readings
+        self.timings["prefix_index"] = time.perf_counter() - start
+
+    def build_key_filter(self, error_rate: float = 0.01):
+        start = time.perf_counter()
+        self._key_filter = BloomFilter.from_keys(chain(self._variant_keys(), self._reading_keys()), error_rate)
+        self.timings["key_filter"] = time.perf_counter() - start
+
+    # shares the backends and indexes, layers can be changed on the copy without affecting lookups on this instance
+    def copy(self) -> "Dictionary":
+        accent = self.accent.copy() if isinstance(self.accent, LayeredDict) else self.accent
+        dic = Dictionary(accent, self.variant, LRUCache(self.cache.max_size))
+        dic._resolved = self._resolved
+        dic._resolved_readings = self._resolved_readings
+        dic._prefixes = self._prefixes
+        # keys added for new layers only cause additional false positives for this instance
+        dic._key_filter = self._key_filter
+        dic._layer_keys = self._layer_keys
+        dic.timings = dict(self.timings)
+        return dic
+
+    def load_layer(self, path: str):
+        if not isinstance(self.accent, LayeredDict):
+            self.accent = LayeredDict(AccentEntry, self.accent)
+        layer = self.accent.load_layer(path)
+        if self._key_filter:
+            for key in chain(layer.variant_keys(), layer.reading_keys()):
+                self._key_filter.add(key)
+        self._layers_changed()
+
+    def remove_layer(self, path: str):
+        if isinstance(self.accent, LayeredDict):
+            self.accent.remove_layer(path)
+            self._layers_changed()
+
+    def _layers_changed(self):
+        # the resolution table doesn't track layers, it's bypassed for all words any current or past layer could affect
+        layer_keys = set(self._layer_keys or ())
+        for layer in self.accent.layers().values():
+            layer_keys.update(layer.reading_keys())
+            for var in layer.variant_keys():
+                layer_keys.add(var)
+                for vent in self.variant.look_up_variant(var) or ():
+                    layer_keys.add(vent.norm_reading)
+                    layer_keys.update(vent.variants)
+        self._layer_keys = layer_keys
+        if self._prefixes:
+            self.build_prefix_index()
+        self.cache.clear()
+
+    def prefix_walk(self) -> Optional[PrefixWalk]:
+        return PrefixWalk(*self._prefixes) if self._prefixes else None
+
+    def look_up(self, word: str, reading_guess: Optional[str] = None) -> Optional[Lookup]:
+        key = (word, reading_guess)
+        lu = self.cache.get(key, _uncached)
+        if lu is _uncached:
+            lu = self._look_up(word, reading_guess)
+            self.cache.put(key, lu)
+        return lu
+
+    def look_up_many(self, queries: Iterable[Tuple[str, Optional[str]]]) -> List[Optional[Lookup]]:
+        queries = list(queries)
+        cache = self.cache
+        results: Dict[Tuple[str, Optional[str]], Optional[Lookup]] = {}
+        resolutions: Dict[str, Optional[Resolution]] = {}
+        # lookups without a matching reading guess are identical for all queries of a word
+        unfiltered: Dict[str, Lookup] = {}
+        for key in queries:
+            if key in results:
+                continue
+            lu = cache.get(key, _uncached)
+            if lu is _uncached:
+                word, reading_guess = key
+                try:
+                    res = resolutions[word]
+                except KeyError:
+                    res = resolutions[word] = self._resolution(word, to_hiragana(word))
+                if res:
+                    lu = self._filtered_lookup(res, reading_guess)
+                    if not lu:
+                        lu = unfiltered.get(word)
+                        if not lu:
+                            lu = unfiltered[word] = Lookup(LookupResult.convert_entries(res.entries), res.uncertain)
+                else:
+                    lu = None
+                cache.put(key, lu)
+            results[key] = lu
+        return [results[key] for key in queries]
+
+    def _look_up(self, word: str, reading_guess: Optional[str]) -> Optional[Lookup]:
+        res = self._resolution(word, to_hiragana(word))
+        if not res:
+            return None
+        return self._filtered_lookup(res, reading_guess) \
+            or Lookup(LookupResult.convert_entries(res.entries), res.uncertain)
+
+    def _resolution(self, word: str, hira_word: str) -> Optional[Resolution]:
+        resolved = self._resolved
+        layer_keys = self._layer_keys
+        if resolved is None or layer_keys and (word in layer_keys or hira_word in layer_keys):
+            # checking the table is just as fast as the filter, it's only worth it for the full tier walk
+            key_filter = self._key_filter
+            if key_filter and word not in key_filter and hira_word not in key_filter:
+                return None
+            return self._resolve(word)
+        res = resolved.get(word)
+        # a word that isn't a key can only be found via its reading, which differs only if it contains katakana
+        if not res and hira_word != word:
+            res = self._resolved_readings.get(hira_word)
+        return res
 
-        return current_lu
+    @staticmethod
+    def _filtered_lookup(res: Resolution, reading_guess: Optional[str]) -> Optional[Lookup]:
+        if res.by_variant and reading_guess:
+            norm_guess = norm_reading(reading_guess)
+            filtered = [e for e in res.entries if e.norm_reading == norm_guess]
+            if filtered:
+                return Lookup(LookupResult.convert_entries(filtered), _check_uncertain(filtered))
+        return None
+
+    def stats(self, memory: bool = False) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "accent": self.accent.stats(memory),
+            "variant": self.variant.stats(memory),
+            "timings": dict(self.timings),
+            "cache": {
+                "size": len(self.cache),
+                "max_size": self.cache.max_size,
+                "hits": self.cache.hits,
+                "misses": self.cache.misses,
+                "evictions": self.cache.evictions,
+            }
+        }
+        if self._key_filter:
+            stats["key_filter"] = {
+                "keys": self._key_filter.key_count,
+                "size_bytes": self._key_filter.size_bytes,
+                "false_positive_rate": self._key_filter.false_positive_rate,
+            }
+        return stats
+
+    # estimating the memory usage walks every table and entry, which takes seconds for the full dictionaries
+    def report(self, memory: bool = False) -> str:
+        return "\n".join(["dictionary stats:", *format_stats(self.stats(memory), 1)])
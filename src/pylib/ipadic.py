@@ -0,0 +1,113 @@
+# This project is licensed under the terms of the GNU GPL v3: https://www.gnu.org/licenses/; © 2022 Ben Kerman
+import os
+from typing import Optional, Tuple
+
+# part of speech of every POS id (the index) in IPADIC, from its pos-id.def
+POS_IDS: Tuple[str, ...] = (
+    "その他,間投,*,*",
+    "フィラー,*,*,*",
+    "感動詞,*,*,*",
+    "記号,アルファベット,*,*",
+    "記号,一般,*,*",
+    "記号,括弧開,*,*",
+    "記号,括弧閉,*,*",
+    "記号,句点,*,*",
+    "記号,空白,*,*",
+    "記号,読点,*,*",
+    "形容詞,自立,*,*",
+    "形容詞,接尾,*,*",
+    "形容詞,非自立,*,*",
+    "助詞,格助詞,一般,*",
+    "助詞,格助詞,引用,*",
+    "助詞,格助詞,連語,*",
+    "助詞,係助詞,*,*",
+    "助詞,終助詞,*,*",
+    "助詞,接続助詞,*,*",
+    "助詞,特殊,*,*",
+    "助詞,副詞化,*,*",
+    "助詞,副助詞,*,*",
+    "助詞,副助詞／並立助詞／終助詞,*,*",
+    "助詞,並立助詞,*,*",
+    "助詞,連体化,*,*",
+    "助動詞,*,*,*",
+    "接続詞,*,*,*",
+    "接頭詞,形容詞接続,*,*",
+    "接頭詞,数接続,*,*",
+    "接頭詞,動詞接続,*,*",
+    "接頭詞,名詞接続,*,*",
+    "動詞,自立,*,*",
+    "動詞,接尾,*,*",
+    "動詞,非自立,*,*",
+    "副詞,一般,*,*",
+    "副詞,助詞類接続,*,*",
+    "名詞,サ変接続,*,*",
+    "名詞,ナイ形容詞語幹,*,*",
+    "名詞,一般,*,*",
+    "名詞,引用文字列,*,*",
+    "名詞,形容動詞語幹,*,*",
+    "名詞,固有名詞,一般,*",
+    "名詞,固有名詞,人名,一般",
+    "名詞,固有名詞,人名,姓",
+    "名詞,固有名詞,人名,名",
+    "名詞,固有名詞,組織,*",
+    "名詞,固有名詞,地域,一般",
+    "名詞,固有名詞,地域,国",
+    "名詞,数,*,*",
+    "名詞,接続詞的,*,*",
+    "名詞,接尾,サ変接続,*",
+    "名詞,接尾,一般,*",
+    "名詞,接尾,形容動詞語幹,*",
+    "名詞,接尾,助数詞,*",
+    "名詞,接尾,助動詞語幹,*",
+    "名詞,接尾,人名,*",
+    "名詞,接尾,地域,*",
+    "名詞,接尾,特殊,*",
+    "名詞,接尾,副詞可能,*",
+    "名詞,代名詞,一般,*",
+    "名詞,代名詞,縮約,*",
+    "名詞,動詞非自立的,*,*",
+    "名詞,特殊,助動詞語幹,*",
+    "名詞,非自立,一般,*",
+    "名詞,非自立,形容動詞語幹,*",
+    "名詞,非自立,助動詞語幹,*",
+    "名詞,非自立,副詞可能,*",
+    "名詞,副詞可能,*,*",
+    "連体詞,*,*,*",
+)
+
+
+def _read_pos_id_def(path: str) -> Optional[Tuple[str, ...]]:
+    with open(path, "rb") as fd:
+        data = fd.read()
+    # the source dictionary is EUC-JP, but some distributions convert all files to UTF-8
+    for encoding in ("utf-8", "euc-jp"):
+        try:
+            lines = data.decode(encoding).splitlines()
+            break
+        except UnicodeDecodeError:
+            pass
+    else:
+        return None
+
+    pos_ids = {}
+    for line in lines:
+        try:
+            pos, pos_id = line.rsplit(maxsplit=1)
+            pos_ids[int(pos_id)] = pos
+        except ValueError:
+            continue
+    return tuple(pos_ids.get(i, "") for i in range(max(pos_ids, default=-1) + 1))
+
+
+# only a dictionary that is known to be IPADIC has these POS ids and features
+def is_ipadic(dic_dir: Optional[str]) -> bool:
+    if not dic_dir:
+        return False
+    try:
+        with open(os.path.join(dic_dir, "dicrc"), "rb") as fd:
+            if b"IPADIC" not in fd.read():
+                return False
+        pos_id_def = os.path.join(dic_dir, "pos-id.def")
+        return not os.path.exists(pos_id_def) or _read_pos_id_def(pos_id_def) == POS_IDS
+    except OSError:
+        return False
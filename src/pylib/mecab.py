@@ -1,27 +1,56 @@
 # This project is licensed under the terms of the GNU GPL v3: https://www.gnu.org/licenses/; © 2022 Ben Kerman
+import asyncio
+import ctypes
+import ctypes.util
 import os
 import platform
 import subprocess
+import sys
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from enum import Enum, auto
 from subprocess import PIPE, Popen
-from typing import List, Optional, Tuple
+from typing import Any, AsyncIterator, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple, \
+    TypeVar, Union
 
+from . import ipadic
 from .normalize import is_kana, to_hiragana
 
+R = TypeVar("R")
+
 
 class MecabError(Exception):
     pass
 
 
+# the process ended while its output was read, unlike for other errors a new process might succeed
+class MecabExitedError(MecabError):
+    pass
+
+
 @dataclass
 class ParserUnit:
+    __slots__ = ("value",)
     value: str
 
     def __repr__(self):
         return f"InputUnit[{self.value}]"
 
 
+class Tokenizer(ABC):
+    @abstractmethod
+    def analyze(self, txt: str) -> List[ParserUnit]:
+        pass
+
+    def analyze_many(self, lines: Sequence[str]) -> List[List[ParserUnit]]:
+        return [self.analyze(line) for line in lines]
+
+    def close(self):
+        pass
+
+
 class HinsiType(Enum):
     ZYOSI = auto()
     YOUGEN = auto()
@@ -31,17 +60,102 @@ class HinsiType(Enum):
     OTHER = auto()
 
 
-@dataclass
+def _classify(hinsi: str, hinsi_class_1: Optional[str]) -> HinsiType:
+    if hinsi == "助詞" or hinsi == "助動詞":
+        return HinsiType.ZYOSI
+    elif hinsi == "動詞" or hinsi == "形容詞":
+        return HinsiType.YOUGEN
+    elif hinsi == "記号":
+        return HinsiType.SYMBOL
+    elif hinsi == "名詞":
+        if hinsi_class_1 == "接尾":
+            return HinsiType.SETUBI
+        elif hinsi_class_1 == "数":
+            return HinsiType.NUMBER
+    return HinsiType.OTHER
+
+
+_UNKNOWN = "未知語"
+
+# part of speech fields and everything derived from them, shared by all units with the same part of speech
+# the categories are all field prefixes comp_hinsi can match, which turns its comparisons into a set lookup
+_Pos = Tuple[str, Optional[str], Optional[str], Optional[str], HinsiType, FrozenSet[Tuple[str, ...]]]
+_poses: Dict[Tuple[str, Optional[str], Optional[str], Optional[str]], _Pos] = {}
+
+# part of speech and conjugation fields, keyed by the feature fields they are parsed from
+# there are only a few thousand distinct combinations in a dictionary, so all units share the same interned strings
+_PosInfo = Tuple[_Pos, Optional[str], Optional[str]]
+_pos_infos: Dict[str, _PosInfo] = {}
+_compact_pos_infos: Dict[str, _PosInfo] = {}
+
+
+def _pos(hinsi: str, c1: Optional[str], c2: Optional[str], c3: Optional[str]) -> _Pos:
+    key = (hinsi, c1, c2, c3)
+    pos = _poses.get(key)
+    if pos is None:
+        fields = tuple(f and sys.intern(f) for f in key)
+        categories = frozenset(fields[:i] for i in range(1, 5) if None not in fields[:i])
+        pos = _poses[key] = (*fields, _classify(fields[0], fields[1]), categories)
+    return pos
+
+
+def _pos_info(head: str, compact: bool) -> Optional[_PosInfo]:
+    fields = head.split(",")
+    if compact:
+        if len(fields) != 3:
+            return None
+        try:
+            fields = ipadic.POS_IDS[int(fields[0])].split(",") + fields[1:]
+        except (ValueError, IndexError):
+            raise MecabError(f"unknown POS id: {fields[0]}")
+    if len(fields) != 6:
+        return None
+
+    # %f[N] leaves out empty (*) fields in the compact format
+    hinsi, c1, c2, c3, conj_type, conj_form = fields
+    info = (_pos(hinsi, *(None if f == "*" else f for f in (c1, c2, c3))),
+            None if conj_type in ("*", "") else sys.intern(conj_type),
+            None if conj_form in ("*", "") else sys.intern(conj_form))
+    (_compact_pos_infos if compact else _pos_infos)[head] = info
+    return info
+
+
 class MecabUnit(ParserUnit):
+    __slots__ = ("hinsi", "hinsi_class_1", "hinsi_class_2", "hinsi_class_3", "conj_type", "conj_form", "base_form",
+                 "reading", "pronunciation", "_hinsi_type", "_categories")
     hinsi: str
-    hinsi_class_1: Optional[str] = None
-    hinsi_class_2: Optional[str] = None
-    hinsi_class_3: Optional[str] = None
-    conj_type: Optional[str] = None
-    conj_form: Optional[str] = None
-    base_form: Optional[str] = None
-    reading: Optional[str] = None
-    pronunciation: Optional[str] = None
+    hinsi_class_1: Optional[str]
+    hinsi_class_2: Optional[str]
+    hinsi_class_3: Optional[str]
+    conj_type: Optional[str]
+    conj_form: Optional[str]
+    base_form: Optional[str]
+    reading: Optional[str]
+    pronunciation: Optional[str]
+    _hinsi_type: HinsiType
+    _categories: FrozenSet[Tuple[str, ...]]
+
+    def __init__(self, value: str, hinsi: str, hinsi_class_1: Optional[str] = None,
+                 hinsi_class_2: Optional[str] = None, hinsi_class_3: Optional[str] = None,
+                 conj_type: Optional[str] = None, conj_form: Optional[str] = None, base_form: Optional[str] = None,
+                 reading: Optional[str] = None, pronunciation: Optional[str] = None, pos: Optional[_Pos] = None):
+        self.value = value
+        self.hinsi, self.hinsi_class_1, self.hinsi_class_2, self.hinsi_class_3, self._hinsi_type, self._categories = \
+            pos or _pos(hinsi, hinsi_class_1, hinsi_class_2, hinsi_class_3)
+        self.conj_type = conj_type
+        self.conj_form = conj_form
+        self.base_form = base_form
+        self.reading = reading
+        self.pronunciation = pronunciation
+
+    def _astuple(self) -> tuple:
+        return (self.value, self.hinsi, self.hinsi_class_1, self.hinsi_class_2, self.hinsi_class_3, self.conj_type,
+                self.conj_form, self.base_form, self.reading, self.pronunciation)
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._astuple() == other._astuple()
 
     def __repr__(self):
         return "MecabUnit[" \
@@ -57,29 +171,10 @@ class MecabUnit(ParserUnit):
                f"{self.pronunciation}]"
 
     def hinsi_type(self) -> HinsiType:
-        if self.hinsi == "助詞" or self.hinsi == "助動詞":
-            return HinsiType.ZYOSI
-        elif self.hinsi == "動詞" or self.hinsi == "形容詞":
-            return HinsiType.YOUGEN
-        elif self.hinsi == "記号":
-            return HinsiType.SYMBOL
-        elif self.hinsi == "名詞":
-            if self.hinsi_class_1 == "接尾":
-                return HinsiType.SETUBI
-            elif self.hinsi_class_1 == "数":
-                return HinsiType.NUMBER
-        return HinsiType.OTHER
+        return self._hinsi_type
 
     def comp_hinsi(self, *args: str):
-        if self.hinsi != args[0]:
-            return False
-        if len(args) > 1 and self.hinsi_class_1 != args[1]:
-            return False
-        if len(args) > 2 and self.hinsi_class_2 != args[2]:
-            return False
-        if len(args) > 3 and self.hinsi_class_3 != args[3]:
-            return False
-        return True
+        return args in self._categories
 
     def base_reading(self) -> Optional[str]:
         if self.hinsi_type() != HinsiType.YOUGEN:
@@ -98,17 +193,28 @@ class MecabUnit(ParserUnit):
         return self.reading[0:len(self.reading) - i] + self.base_form[len(self.value) - i:]
 
     @classmethod
-    def from_line(cls, line: str) -> Tuple["MecabUnit", int, int]:
-        def raise_on_ast(val: str) -> str:
-            if val == "*":
-                raise MecabError("unexpected empty value in unit")
-            else:
-                return val
+    def from_feature(cls, orig: str, feature: str, compact: bool = False) -> "MecabUnit":
+        # format: 品詞,品詞細分類1,品詞細分類2,品詞細分類3,活用型,活用形,原形,読み,発音
+        # compact format: 品詞ID,活用型,活用形,原形,読み,発音
+        if feature == _UNKNOWN or feature.startswith("未知語,"):
+            return cls(orig, _UNKNOWN)
+        fields = feature.rsplit(",", 3)
+        info = len(fields) == 4 and ((_compact_pos_infos if compact else _pos_infos).get(fields[0])
+                                     or _pos_info(fields[0], compact))
+        if not info:
+            raise MecabError(f"invalid number of fields: {orig}\t{feature}")
 
-        def ast_to_none(val: str) -> Optional[str]:
-            return None if val == "*" else val
+        _, base_form, reading, pronunciation = fields
+        if base_form in ("*", "") or reading in ("*", "") or pronunciation in ("*", ""):
+            raise MecabError("unexpected empty value in unit")
 
-        # format: %m(表層形)\t%ps,%pe,%H(品詞,品詞細分類1,品詞細分類2,品詞細分類3,活用型,活用形,原形,読み,発音)
+        pos, conj_type, conj_form = info
+        return cls(orig, pos[0], pos[1], pos[2], pos[3], conj_type, conj_form, base_form,
+                   to_hiragana(reading), to_hiragana(pronunciation), pos)
+
+    @classmethod
+    def from_line(cls, line: str, compact: bool = False) -> Tuple["MecabUnit", int, int]:
+        # format: %m(表層形)\t%ps,%pe,%H or %m\t%ps,%pe,%h,%f[4],%f[5],%f[6],%f[7],%f[8] with compact
         orig: str
         data: str
         try:
@@ -116,69 +222,474 @@ class MecabUnit(ParserUnit):
         except ValueError:
             raise MecabError(f"invalid line: {line}")
 
-        fields = data.split(",")
-        if len(fields) < 3 or (fields[2] != "未知語" and len(fields) != 11):
+        fields = data.split(",", 2)
+        if len(fields) < 3:
             raise MecabError(f"invalid number of fields: {line}")
+        return cls.from_feature(orig, fields[2], compact), int(fields[0]), int(fields[1])
 
-        if fields[2] != "未知語":
-            obj = cls(orig, fields[2],
-                      ast_to_none(fields[3]),
-                      ast_to_none(fields[4]),
-                      ast_to_none(fields[5]),
-                      ast_to_none(fields[6]),
-                      ast_to_none(fields[7]),
-                      raise_on_ast(fields[8]),
-                      to_hiragana(raise_on_ast(fields[9])),
-                      to_hiragana(raise_on_ast(fields[10])))
-        else:
-            obj = cls(orig, fields[2])
-        return obj, int(fields[0]), int(fields[1])
+
+# splitting batches smaller than this costs more in thread and process overhead than it saves
+_MIN_CHUNK_SIZE = 200
+
+
+def _options(exe_path: Optional[str], dic_dir: Optional[str]) -> List[str]:
+    options = ["--unk-feature=未知語"]
+    if exe_path:
+        options.append(f"--rcfile={os.path.join(os.path.dirname(exe_path), 'mecabrc')}")
+    if dic_dir:
+        options.append(f"--dicdir={dic_dir}")
+    return options
+
+
+def _command(exe_path: Optional[str], dic_dir: Optional[str],
+             compact: bool) -> Tuple[List[str], Dict[str, str], Any]:
+    env = os.environ.copy()
+    args = [exe_path] if exe_path else ["mecab"]
+    if compact:
+        # only the POS id is sent instead of the part of speech fields, unknown words don't have any other features
+        args.extend(("--node-format=%m\\t%ps,%pe,%h,%f[4],%f[5],%f[6],%f[7],%f[8]\\n",
+                     f"--unk-format=%m\\t%ps,%pe,{_UNKNOWN}\\n"))
+    else:
+        args.append("--node-format=%m\\t%ps,%pe,%H\\n")
+    args.extend(_options(exe_path, dic_dir))
+    if exe_path and platform.system() == "Linux":
+        env["LD_LIBRARY_PATH"] = os.path.dirname(exe_path)
+
+    if platform.system() == "Windows":
+        si = subprocess.STARTUPINFO()
+        si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    else:
+        si = None
+    return args, env, si
+
+
+# output holds the node lines for one input line, without the EOS line
+def units_from_output(output: Iterable[str], utf8_bytes: bytes, compact: bool) -> List[ParserUnit]:
+    units = []
+    last_end = 0
+    for line in output:
+        unit, start, end = MecabUnit.from_line(line, compact)
+        if last_end != start:
+            units.append(ParserUnit(utf8_bytes[last_end:start].decode("utf-8")))
+        last_end = end
+        units.append(unit)
+    return units
+
+
+def _chunks(lines: Sequence[str], worker_count: int) -> List[Sequence[str]]:
+    chunk_size = max(-(-len(lines) // worker_count), _MIN_CHUNK_SIZE)
+    return [lines[i:i + chunk_size] for i in range(0, len(lines), chunk_size)]
 
 
 @dataclass
-class Mecab:
+class Mecab(Tokenizer):
     exe_path: Optional[str] = None
     dic_dir: Optional[str] = None
     _inst: Optional[Popen] = field(default=None, init=False)
+    _compact: bool = field(default=False, init=False)
+
+    def close(self):
+        if self._inst is not None:
+            self._inst.kill()
+            self._inst.wait()
+            self._inst = None
 
     def _instance(self) -> Popen:
         if self._inst is None or self._inst.poll() is not None:
-            env = os.environ.copy()
-            args = [self.exe_path] if self.exe_path else ["mecab"]
-            args.extend(("--unk-feature=未知語", "--node-format=%m\\t%ps,%pe,%H\\n"))
-            if self.exe_path:
-                if platform.system() == "Linux":
-                    env["LD_LIBRARY_PATH"] = os.path.dirname(self.exe_path)
-                args.append(f"--rcfile={os.path.join(os.path.dirname(self.exe_path), 'mecabrc')}")
-            if self.dic_dir:
-                args.append(f"--dicdir={self.dic_dir}")
-
+            self._compact = ipadic.is_ipadic(self.dic_dir)
+            args, env, si = _command(self.exe_path, self.dic_dir, self._compact)
             try:
-                if platform.system() == "Windows":
-                    si = subprocess.STARTUPINFO()
-                    si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                else:
-                    si = None
                 self._inst = Popen(args, stdin=PIPE, stdout=PIPE, env=env, startupinfo=si)
             except FileNotFoundError:
                 raise MecabError("executable not found")
 
         return self._inst
 
+    @property
+    def compact(self) -> bool:
+        return self._compact
+
+    @staticmethod
+    def _output_lines(inst: Popen) -> Iterator[str]:
+        while True:
+            line = inst.stdout.readline()
+            if not line:
+                raise MecabExitedError("MeCab exited unexpectedly")
+            line = line.rstrip(b"\r\n").decode("utf-8")
+            if line == "EOS":
+                return
+            yield line
+
+    def _read_output(self, inst: Popen, _) -> List[str]:
+        return list(self._output_lines(inst))
+
+    def _read_units(self, inst: Popen, utf8_bytes: bytes) -> List[ParserUnit]:
+        return units_from_output(self._output_lines(inst), utf8_bytes, self._compact)
+
     def analyze(self, txt: str) -> List[ParserUnit]:
         if "\n" in txt:
             raise MecabError("line feed in text passed to analyze function")
 
         inst = self._instance()
         utf8_bytes = txt.encode("utf-8")
-        inst.stdin.write(utf8_bytes + b"\n")
-        inst.stdin.flush()
+        try:
+            inst.stdin.write(utf8_bytes + b"\n")
+            inst.stdin.flush()
+            return self._read_units(inst, utf8_bytes)
+        except BaseException:
+            # unread output would be mistaken for the result of the next line, the process can't be used anymore
+            self.close()
+            raise
+
+    def _run_many(self, lines: Sequence[str], read: Callable[[Popen, bytes], R]) -> List[R]:
+        if any("\n" in line for line in lines):
+            raise MecabError("line feed in text passed to analyze function")
+        if not lines:
+            return []
+
+        inst = self._instance()
+        encoded = [line.encode("utf-8") for line in lines]
+
+        # MeCab stops reading once its output pipe is full, so the input has to be written while results are read
+        def write():
+            try:
+                inst.stdin.write(b"".join(line + b"\n" for line in encoded))
+                inst.stdin.flush()
+            except OSError:
+                # writing only fails once the process is gone, which the reader notices at the end of the output
+                pass
+
+        writer = threading.Thread(target=write, daemon=True)
+        writer.start()
+        try:
+            return [read(inst, utf8_bytes) for utf8_bytes in encoded]
+        except BaseException:
+            # the remaining output is never read, the writer could be blocked and the process is unusable anyway
+            self.close()
+            raise
+        finally:
+            writer.join()
+
+    def analyze_many(self, lines: Sequence[str]) -> List[List[ParserUnit]]:
+        return self._run_many(lines, self._read_units)
+
+    # the node lines MeCab outputs for each line, in the compact format if the compact property is set afterwards
+    def analyze_output(self, lines: Sequence[str]) -> List[List[str]]:
+        return self._run_many(lines, self._read_output)
+
+
+# mecab_node_t from mecab.h
+class _Node(ctypes.Structure):
+    pass
+
+
+_Node._fields_ = [
+    ("prev", ctypes.POINTER(_Node)),
+    ("next", ctypes.POINTER(_Node)),
+    ("enext", ctypes.POINTER(_Node)),
+    ("bnext", ctypes.POINTER(_Node)),
+    ("rpath", ctypes.c_void_p),
+    ("lpath", ctypes.c_void_p),
+    ("surface", ctypes.c_void_p),
+    ("feature", ctypes.c_char_p),
+    ("id", ctypes.c_uint),
+    ("length", ctypes.c_ushort),
+    ("rlength", ctypes.c_ushort),
+    ("rcAttr", ctypes.c_ushort),
+    ("lcAttr", ctypes.c_ushort),
+    ("posid", ctypes.c_ushort),
+    ("char_type", ctypes.c_ubyte),
+    ("stat", ctypes.c_ubyte),
+    ("isbest", ctypes.c_ubyte),
+    ("alpha", ctypes.c_float),
+    ("beta", ctypes.c_float),
+    ("prob", ctypes.c_float),
+    ("wcost", ctypes.c_short),
+    ("cost", ctypes.c_long),
+]
+
+_BOS_NODE = 2
+_EOS_NODE = 3
+
+_libraries: Dict[str, ctypes.CDLL] = {}
+
+
+def find_library(exe_path: Optional[str]) -> Optional[str]:
+    # the library has to match the executable that would be used otherwise, so only the system one is searched for
+    if not exe_path:
+        return ctypes.util.find_library("mecab")
+
+    names = {
+        "Windows": ("libmecab.dll",),
+        "Darwin": ("libmecab.dylib", "libmecab.2.dylib"),
+    }.get(platform.system(), ("libmecab.so", "libmecab.so.2"))
+    for name in names:
+        path = os.path.join(os.path.dirname(exe_path), name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _load_library(path: str) -> ctypes.CDLL:
+    lib = _libraries.get(path)
+    if lib is None:
+        lib = ctypes.CDLL(path)
+        lib.mecab_new.argtypes = (ctypes.c_int, ctypes.POINTER(ctypes.c_char_p))
+        lib.mecab_new.restype = ctypes.c_void_p
+        lib.mecab_sparse_tonode2.argtypes = (ctypes.c_void_p, ctypes.c_char_p, ctypes.c_size_t)
+        lib.mecab_sparse_tonode2.restype = ctypes.POINTER(_Node)
+        lib.mecab_strerror.argtypes = (ctypes.c_void_p,)
+        lib.mecab_strerror.restype = ctypes.c_char_p
+        lib.mecab_destroy.argtypes = (ctypes.c_void_p,)
+        lib.mecab_destroy.restype = None
+        _libraries[path] = lib
+    return lib
+
+
+# runs MeCab in-process and reads the nodes directly instead of parsing the output of a subprocess
+class LibMecab(Tokenizer):
+    _lib: ctypes.CDLL
+    _args: List[str]
+    _tagger: Optional[int]
+
+    def __init__(self, lib: ctypes.CDLL, args: List[str]):
+        self._lib = lib
+        self._args = args
+        self._tagger = None
+
+    @classmethod
+    def load(cls, exe_path: Optional[str] = None, dic_dir: Optional[str] = None) -> Optional["LibMecab"]:
+        path = find_library(exe_path)
+        if path is None:
+            return None
+        try:
+            lib = _load_library(path)
+        except (OSError, AttributeError):
+            return None
+        return cls(lib, ["mecab", *_options(exe_path, dic_dir)])
+
+    def close(self):
+        if self._tagger is not None:
+            self._lib.mecab_destroy(self._tagger)
+            self._tagger = None
+
+    def _instance(self) -> int:
+        if self._tagger is None:
+            argv = (ctypes.c_char_p * len(self._args))(*(os.fsencode(arg) for arg in self._args))
+            self._tagger = self._lib.mecab_new(len(self._args), argv)
+            if not self._tagger:
+                self._tagger = None
+                raise MecabError(f"creating tagger failed: {self._lib.mecab_strerror(None).decode('utf-8', 'replace')}")
+        return self._tagger
+
+    def analyze(self, txt: str) -> List[ParserUnit]:
+        if "\n" in txt:
+            raise MecabError("line feed in text passed to analyze function")
+
+        tagger = self._instance()
+        utf8_bytes = txt.encode("utf-8")
+        # the surface pointers point into this buffer, their offsets are the byte positions in the text
+        buf = ctypes.create_string_buffer(utf8_bytes, len(utf8_bytes))
+        buf_addr = ctypes.addressof(buf)
+        node_ptr = self._lib.mecab_sparse_tonode2(tagger, buf, len(utf8_bytes))
+        if not node_ptr:
+            raise MecabError(self._lib.mecab_strerror(tagger).decode("utf-8", "replace"))
+
         units = []
         last_end = 0
-        while (line := inst.stdout.readline().rstrip(b"\r\n")) != b"EOS":
-            unit, start, end = MecabUnit.from_line(line.decode("utf-8"))
-            if last_end != start:
-                units.append(ParserUnit(utf8_bytes[last_end:start].decode("utf-8")))
-            last_end = end
-            units.append(unit)
+        while node_ptr:
+            node = node_ptr.contents
+            if node.stat == _EOS_NODE:
+                break
+            if node.stat != _BOS_NODE:
+                start = node.surface - buf_addr
+                end = start + node.length
+                if last_end != start:
+                    units.append(ParserUnit(utf8_bytes[last_end:start].decode("utf-8")))
+                last_end = end
+                orig = utf8_bytes[start:end].decode("utf-8")
+                units.append(MecabUnit.from_feature(orig, node.feature.decode("utf-8")))
+            node_ptr = node.next
         return units
+
+    def analyze_many(self, lines: Sequence[str]) -> List[List[ParserUnit]]:
+        if any("\n" in line for line in lines):
+            raise MecabError("line feed in text passed to analyze function")
+        return [self.analyze(line) for line in lines]
+
+
+@dataclass
+class MecabPool(Tokenizer):
+    exe_path: Optional[str] = None
+    dic_dir: Optional[str] = None
+    size: int = 0
+    in_process: bool = False
+    _workers: List[Tokenizer] = field(default_factory=list, init=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False)
+
+    def __post_init__(self):
+        # processes are only started once a worker is used for the first time
+        count = self.size if self.size > 0 else os.cpu_count() or 1
+        if self.in_process:
+            # ctypes releases the GIL while MeCab runs, so in-process workers can also analyze in parallel
+            self._workers = [w for w in (LibMecab.load(self.exe_path, self.dic_dir) for _ in range(count)) if w]
+            if self._workers:
+                return
+            print("MeCab library not found, falling back to a subprocess")
+        self._workers = [Mecab(self.exe_path, self.dic_dir) for _ in range(count)]
+
+    def close(self):
+        for worker in self._workers:
+            worker.close()
+
+    @staticmethod
+    def _run(worker: Tokenizer, lines: Sequence[str]) -> List[List[ParserUnit]]:
+        try:
+            return worker.analyze_many(lines)
+        except MecabExitedError:
+            # a crashed process is replaced with a fresh one on the next call, other errors would just happen again
+            return worker.analyze_many(lines)
+
+    def analyze(self, txt: str) -> List[ParserUnit]:
+        with self._lock:
+            return self._workers[0].analyze(txt)
+
+    def analyze_many(self, lines: Sequence[str]) -> List[List[ParserUnit]]:
+        chunks = _chunks(lines, len(self._workers))
+        with self._lock:
+            if len(chunks) <= 1:
+                return self._run(self._workers[0], lines)
+            with ThreadPoolExecutor(len(chunks)) as executor:
+                results = executor.map(self._run, self._workers, chunks)
+                return [units for chunk_res in results for units in chunk_res]
+
+
+@dataclass
+class AsyncMecab:
+    exe_path: Optional[str] = None
+    dic_dir: Optional[str] = None
+    _proc: Optional[asyncio.subprocess.Process] = field(default=None, init=False)
+    _compact: bool = field(default=False, init=False)
+    # created on first use, before Python 3.10 locks are bound to the event loop that is current when they're created
+    _lock: Optional[asyncio.Lock] = field(default=None, init=False)
+
+    def close(self):
+        if self._proc is not None and self._proc.returncode is None:
+            self._proc.kill()
+        self._proc = None
+
+    async def _instance(self) -> asyncio.subprocess.Process:
+        if self._proc is None or self._proc.returncode is not None:
+            self._compact = ipadic.is_ipadic(self.dic_dir)
+            args, env, si = _command(self.exe_path, self.dic_dir, self._compact)
+            try:
+                self._proc = await asyncio.create_subprocess_exec(*args, stdin=PIPE, stdout=PIPE, env=env,
+                                                                  startupinfo=si)
+            except FileNotFoundError:
+                raise MecabError("executable not found")
+
+        return self._proc
+
+    async def _read_units(self, proc: asyncio.subprocess.Process, utf8_bytes: bytes) -> List[ParserUnit]:
+        output = []
+        while True:
+            line = await proc.stdout.readline()
+            if not line:
+                raise MecabError("MeCab exited unexpectedly")
+            line = line.rstrip(b"\r\n").decode("utf-8")
+            if line == "EOS":
+                return units_from_output(output, utf8_bytes, self._compact)
+            output.append(line)
+
+    async def analyze(self, txt: str) -> List[ParserUnit]:
+        if "\n" in txt:
+            raise MecabError("line feed in text passed to analyze function")
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            proc = await self._instance()
+            utf8_bytes = txt.encode("utf-8")
+            proc.stdin.write(utf8_bytes + b"\n")
+            try:
+                await proc.stdin.drain()
+                return await self._read_units(proc, utf8_bytes)
+            except BaseException:
+                self.close()
+                raise
+
+    async def analyze_stream(self, lines: Iterable[str]) -> AsyncIterator[List[ParserUnit]]:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            proc = await self._instance()
+            # the writer passes on every line it has written, so that results are yielded while input is still written
+            written: "asyncio.Queue[Union[bytes, BaseException, None]]" = asyncio.Queue()
+
+            async def write():
+                try:
+                    for line in lines:
+                        if "\n" in line:
+                            raise MecabError("line feed in text passed to analyze function")
+                        utf8_bytes = line.encode("utf-8")
+                        proc.stdin.write(utf8_bytes + b"\n")
+                        written.put_nowait(utf8_bytes)
+                        await proc.stdin.drain()
+                    written.put_nowait(None)
+                except Exception as e:
+                    written.put_nowait(e)
+
+            writer = asyncio.ensure_future(write())
+            try:
+                while (item := await written.get()) is not None:
+                    if isinstance(item, BaseException):
+                        raise item
+                    yield await self._read_units(proc, item)
+            except BaseException:
+                # unread output is left in the pipe, the process can't be used for another analysis
+                self.close()
+                raise
+            finally:
+                writer.cancel()
+
+
+@dataclass
+class AsyncMecabPool:
+    exe_path: Optional[str] = None
+    dic_dir: Optional[str] = None
+    size: int = 0
+    _workers: List[AsyncMecab] = field(default_factory=list, init=False)
+    _idle: Optional["asyncio.Queue[AsyncMecab]"] = field(default=None, init=False)
+
+    def __post_init__(self):
+        count = self.size if self.size > 0 else os.cpu_count() or 1
+        self._workers = [AsyncMecab(self.exe_path, self.dic_dir) for _ in range(count)]
+
+    def close(self):
+        for worker in self._workers:
+            worker.close()
+
+    async def _acquire(self) -> AsyncMecab:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for worker in self._workers:
+                self._idle.put_nowait(worker)
+        return await self._idle.get()
+
+    async def analyze(self, txt: str) -> List[ParserUnit]:
+        worker = await self._acquire()
+        try:
+            return await worker.analyze(txt)
+        finally:
+            self._idle.put_nowait(worker)
+
+    async def _analyze_chunk(self, lines: Sequence[str]) -> List[List[ParserUnit]]:
+        worker = await self._acquire()
+        try:
+            return [units async for units in worker.analyze_stream(lines)]
+        finally:
+            self._idle.put_nowait(worker)
+
+    async def analyze_many(self, lines: Sequence[str]) -> List[List[ParserUnit]]:
+        results = await asyncio.gather(*(self._analyze_chunk(chunk) for chunk in _chunks(lines, len(self._workers))))
+        return [units for chunk_res in results for units in chunk_res]
@@ -0,0 +1,86 @@
+# This project is licensed under the terms of the GNU GPL v3: https://www.gnu.org/licenses/; © 2022 Ben Kerman
+import lzma
+from typing import Dict, List, Optional, Sequence, Set, TextIO
+
+from .mecab import Mecab, MecabError, ParserUnit, Tokenizer, units_from_output
+
+# layout: header line, then for every input line the line itself, MeCab's node lines and EOS
+# lines are only separated by line feeds, input lines can contain any other character
+_HEADER = "# JRP MeCab recording v1, node format: "
+_FULL = "full"
+_COMPACT = "compact"
+
+
+class MecabRecorder(Tokenizer):
+    mecab: Mecab
+    _fd: Optional[TextIO]
+    _path: str
+    _recorded: Set[str]
+
+    def __init__(self, mecab: Mecab, path: str):
+        self.mecab = mecab
+        self._path = path
+        self._fd = None
+        self._recorded = set()
+
+    def close(self):
+        self.mecab.close()
+        if self._fd is not None:
+            self._fd.close()
+            self._fd = None
+
+    def _record(self, lines: Sequence[str], outputs: List[List[str]]):
+        if self._fd is None:
+            self._fd = lzma.open(self._path, "wt", encoding="utf-8", newline="\n")
+            self._fd.write(f"{_HEADER}{_COMPACT if self.mecab.compact else _FULL}\n")
+        for line, output in zip(lines, outputs):
+            if line not in self._recorded:
+                self._recorded.add(line)
+                self._fd.write("".join(f"{out_line}\n" for out_line in (line, *output, "EOS")))
+
+    def analyze(self, txt: str) -> List[ParserUnit]:
+        return self.analyze_many([txt])[0]
+
+    def analyze_many(self, lines: Sequence[str]) -> List[List[ParserUnit]]:
+        outputs = self.mecab.analyze_output(lines)
+        self._record(lines, outputs)
+        return [units_from_output(output, line.encode("utf-8"), self.mecab.compact)
+                for line, output in zip(lines, outputs)]
+
+
+# replays a recording, the output is parsed again on every call just like MeCab's
+class MecabReplay(Tokenizer):
+    _outputs: Dict[str, List[str]]
+    _compact: bool
+
+    def __init__(self, path: str):
+        self._outputs = {}
+        fd: TextIO
+        with lzma.open(path, "rt", encoding="utf-8", newline="\n") as fd:
+            header = fd.readline().rstrip("\n")
+            if not header.startswith(_HEADER) or header[len(_HEADER):] not in (_FULL, _COMPACT):
+                raise MecabError(f"not a MeCab recording: {path}")
+            self._compact = header[len(_HEADER):] == _COMPACT
+
+            line = None
+            output: List[str] = []
+            for rec_line in (rl.rstrip("\n") for rl in fd):
+                if line is None:
+                    line = rec_line
+                elif rec_line == "EOS":
+                    self._outputs[line] = output
+                    line = None
+                    output = []
+                else:
+                    output.append(rec_line)
+            if line is not None:
+                raise MecabError(f"truncated MeCab recording: {path}")
+
+    def lines(self) -> List[str]:
+        return list(self._outputs)
+
+    def analyze(self, txt: str) -> List[ParserUnit]:
+        output = self._outputs.get(txt)
+        if output is None:
+            raise MecabError(f"line not in recording: {txt}")
+        return units_from_output(output, txt.encode("utf-8"), self._compact)
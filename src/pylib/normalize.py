@@ -1,4 +1,6 @@
 # This project is licensed under the terms of the GNU GPL v3: https://www.gnu.org/licenses/; © 2022 Ben Kerman
+import sys
+from functools import lru_cache
 from typing import Callable, Iterable, List
 
 _hira = "ぁあぃいぅうぇえぉおかがきぎくぐけげこごさざしじすずせぜそぞただちぢっつづてでとどなにぬねのはばぱひびぴふぶぷへべぺほぼぽまみむめもゃやゅゆょよらりるれろゎわゐゑをんゔゕゖゝゞ"
@@ -28,6 +30,11 @@ def to_hiragana(val: str) -> str:
     return val.translate(_to_hira_tbl)
 
 
+@lru_cache(maxsize=4096)
+def norm_reading(val: str) -> str:
+    return sys.intern(to_hiragana(val))
+
+
 def itr_to_hira(itr: Iterable[str]) -> List[str]:
     return _itr_conv(itr, to_hiragana)
 
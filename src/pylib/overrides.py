@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from typing import Any, Iterable, List, Optional, Tuple, Union
 
 from .accents import Accent
-from .normalize import comp_kana
+from .normalize import norm_reading
 from .util import ConfigError, from_json
 
 
@@ -16,7 +16,8 @@ class IgnoreOverride:
         return f"ignore {self.reading or ''}【{'・'.join(self.variants)}】"
 
     def match(self, variant: str, reading: Optional[str]) -> bool:
-        return variant in self.variants and (not self.reading or not reading or comp_kana(reading, self.reading))
+        return variant in self.variants \
+               and (not self.reading or not reading or norm_reading(reading) == norm_reading(self.reading))
 
     @classmethod
     def default(cls) -> "IgnoreOverride":
@@ -39,7 +40,7 @@ class WordOverride:
 
     def apply(self, variant: str, reading: Optional[str]) -> Optional[Iterable[Tuple[str, Optional[str]]]]:
         if variant in self.old_variants \
-                and (not self.old_reading or not reading or comp_kana(reading, self.old_reading)):
+                and (not self.old_reading or not reading or norm_reading(reading) == norm_reading(self.old_reading)):
             new_variants = self.new_variants or (variant,)
             return ((nv, self.new_reading or reading) for nv in new_variants)
         else:
@@ -69,6 +70,6 @@ class AccentOverride:
         return f"{self.reading}【{'・'.join(self.variants)}】→ [{']['.join(map(str, self.accents))}]"
 
     def match(self, variant: str, reading: str) -> bool:
-        return variant in self.variants and comp_kana(reading, self.reading)
+        return variant in self.variants and norm_reading(reading) == norm_reading(self.reading)
 
     default = None
@@ -60,6 +60,13 @@ class AddonPrefs:
     mecab_dict_dir: str = os.path.join("data", "ipadic")
     mecab_use_system_exe: bool = platform.system() != "Windows"
     mecab_use_system_dict: bool = False
+    mecab_processes: int = 0
+    mecab_in_process: bool = False
+    analysis_cache_size: int = 5000
+    analysis_disk_cache_size: int = 100000
+    lookup_cache_size: int = 20000
+    lazy_dictionary: bool = False
+    sqlite_dictionary: bool = False
     note_types: List[NoteTypePrefs] = field(default_factory=list)
 
 
@@ -123,6 +130,11 @@ class ConvPrefs:
                     return gen
         return None
 
+    def has_word_or_prefix(self, prefix: str) -> bool:
+        defaults = (do.value for do in default_overrides.word if do.id not in self.disabled_override_ids.word)
+        return any(v.startswith(prefix) for wo in chain(self.overrides.word, defaults) if wo.pre_lookup
+                   for v in wo.old_variants)
+
     def apply_accent_or(self, variant: str, reading: str) -> Optional[List[Accent]]:
         defaults = (ao.value for ao in default_overrides.accent if ao.id not in self.disabled_override_ids.accent)
         for ao in chain(self.overrides.accent, defaults):
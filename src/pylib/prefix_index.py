@@ -0,0 +1,42 @@
+# This project is licensed under the terms of the GNU GPL v3: https://www.gnu.org/licenses/; © 2022 Ben Kerman
+from bisect import bisect_left
+from typing import Iterable, List, Tuple
+
+from .normalize import to_hiragana
+
+
+class PrefixIndex:
+    _keys: List[str]
+
+    def __init__(self, keys: Iterable[str]):
+        self._keys = sorted(set(keys))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def find(self, prefix: str, lo: int = 0) -> Tuple[int, bool]:
+        # the insertion point only moves forward while the prefix grows, so callers can resume from it
+        pos = bisect_left(self._keys, prefix, lo)
+        return pos, pos < len(self._keys) and self._keys[pos].startswith(prefix)
+
+
+class PrefixWalk:
+    _variants: PrefixIndex
+    _readings: PrefixIndex
+    _var_pos: int
+    _read_pos: int
+
+    def __init__(self, variants: PrefixIndex, readings: PrefixIndex):
+        self._variants = variants
+        self._readings = readings
+        self._var_pos = 0
+        self._read_pos = 0
+
+    # each prefix passed to this must start with the one from the previous call
+    def extend(self, prefix: str) -> bool:
+        self._var_pos, var_found = self._variants.find(prefix, self._var_pos)
+        self._read_pos, read_found = self._readings.find(to_hiragana(prefix), self._read_pos)
+        return var_found or read_found
+
+    def can_extend(self, prefix: str) -> bool:
+        return self._variants.find(prefix)[1] or self._readings.find(to_hiragana(prefix))[1]
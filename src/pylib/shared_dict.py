@@ -0,0 +1,94 @@
+# This project is licensed under the terms of the GNU GPL v3: https://www.gnu.org/licenses/; © 2022 Ben Kerman
+import multiprocessing
+import struct
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+
+from .compiled_dict import CompiledDict, CompiledDictError, compile_backend
+from .dictionary import AccentEntry, Dictionary, VariantEntry
+
+# layout: header, compiled accent dictionary, compiled variant dictionary
+_MAGIC = b"JRPS"
+_header = struct.Struct("<4sQQ")
+
+
+# the dictionary is only usable while the instance is alive, it's closed once it's garbage collected
+class SharedDictionary:
+    dictionary: Dictionary
+    _shm: SharedMemory
+    _view: Optional[memoryview]
+    _owner: bool
+
+    def __init__(self, shm: SharedMemory, owner: bool):
+        self._shm = shm
+        self._view = None
+        self._owner = owner
+
+        magic, acc_len, var_len = _header.unpack_from(shm.buf)
+        if magic != _MAGIC:
+            raise CompiledDictError(f"not a shared dictionary: {shm.name}")
+        view = shm.buf.toreadonly()
+        acc_start = _header.size
+        var_start = acc_start + acc_len
+        self.dictionary = Dictionary(CompiledDict(AccentEntry, view[acc_start:var_start]),
+                                     CompiledDict(VariantEntry, view[var_start:var_start + var_len]))
+        self._view = view
+
+    def __enter__(self) -> "SharedDictionary":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @classmethod
+    def publish(cls, dic: Dictionary, name: Optional[str] = None) -> "SharedDictionary":
+        acc_data = compile_backend(dic.accent)
+        var_data = compile_backend(dic.variant)
+        size = _header.size + len(acc_data) + len(var_data)
+        shm = SharedMemory(name, create=True, size=size)
+        try:
+            shm.buf[_header.size:_header.size + len(acc_data)] = acc_data
+            shm.buf[_header.size + len(acc_data):size] = var_data
+            _header.pack_into(shm.buf, 0, _MAGIC, len(acc_data), len(var_data))
+            return cls(shm, True)
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedDictionary":
+        try:
+            shm = SharedMemory(name, track=False)
+        except TypeError:
+            # before Python 3.13 attaching registers the segment with the resource tracker, which destroys it when the
+            # process exits; processes started by multiprocessing share their parent's tracker and must leave it alone
+            shm = SharedMemory(name)
+            if multiprocessing.parent_process() is None:
+                resource_tracker.unregister(shm._name, "shared_memory")
+        try:
+            return cls(shm, False)
+        except BaseException:
+            shm.close()
+            raise
+
+    # only the publisher removes the segment, processes that are still attached can keep using it until they close
+    def close(self):
+        # the segment can't be unmapped while any views of it exist
+        if self._view is None:
+            return
+        self.dictionary.accent.close()
+        self.dictionary.variant.close()
+        self._view.release()
+        self._view = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
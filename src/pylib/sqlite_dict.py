@@ -0,0 +1,194 @@
+# This project is licensed under the terms of the GNU GPL v3: https://www.gnu.org/licenses/; © 2022 Ben Kerman
+import hashlib
+import lzma
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Any, Dict, Generic, Iterable, List, Optional, TextIO, Type, TypeVar
+
+from .dict_snapshot import source_key
+from .normalize import to_hiragana
+from .util import LRUCache
+
+T = TypeVar("T")
+
+_VERSION = 1
+
+_schema = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE entries (id INTEGER PRIMARY KEY, line TEXT NOT NULL);
+CREATE TABLE variants (key TEXT NOT NULL, entry_id INTEGER NOT NULL);
+CREATE TABLE readings (key TEXT NOT NULL, entry_id INTEGER NOT NULL);
+"""
+
+# rowid order is insertion order, which keeps the results in the same order as BasicDict's
+_look_up_sql = {
+    table: f"SELECT e.id, e.line FROM {table} k JOIN entries e ON e.id = k.entry_id WHERE k.key = ? ORDER BY k.rowid"
+    for table in ("variants", "readings")
+}
+
+
+def _source_key(entry_type: Type[T], src_path: str) -> str:
+    return repr(source_key(src_path, _VERSION, entry_type.__name__))
+
+
+def build_sqlite_dict(entry_type: Type[T], src_path: str, tgt_path: str, key: Optional[str] = None):
+    tmp_path = f"{tgt_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    con = sqlite3.connect(tmp_path)
+    try:
+        con.executescript(_schema)
+        fd: TextIO
+        with con, lzma.open(src_path, "rt", encoding="utf-8") as fd:
+            entry_id = 0
+            for line in (rl.rstrip("\r\n") for rl in fd):
+                if line.startswith("#"):
+                    continue
+
+                try:
+                    entry = entry_type.from_line(line)
+                except ValueError:
+                    print(f"skipping invalid dict entry: {line}")
+                    continue
+
+                con.execute("INSERT INTO entries VALUES (?, ?)", (entry_id, line))
+                con.execute("INSERT INTO readings VALUES (?, ?)", (entry.norm_reading, entry_id))
+                con.executemany("INSERT INTO variants VALUES (?, ?)", ((var, entry_id) for var in entry.variants))
+                entry_id += 1
+
+            con.execute("CREATE INDEX variants_key ON variants (key)")
+            con.execute("CREATE INDEX readings_key ON readings (key)")
+            con.execute("INSERT INTO meta VALUES ('source', ?)", (key or _source_key(entry_type, src_path),))
+        con.execute("VACUUM")
+    finally:
+        con.close()
+    os.replace(tmp_path, tgt_path)
+
+
+# databases built from earlier versions of the source are left behind if they were still open, they're removed later
+# along with the unversioned database older versions of the add-on created
+def _remove_outdated(root: str, ext: str, current_path: str):
+    dir_path, name = os.path.split(root)
+    for fn in os.listdir(dir_path or "."):
+        path = os.path.join(dir_path, fn)
+        if (fn.startswith(f"{name}-") and fn.endswith(ext) or fn == f"{name}{ext}") and path != current_path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class SqliteDict(Generic[T]):
+    _entry_type: Type[T]
+    _con: sqlite3.Connection
+    _lock: threading.Lock
+    _entries: LRUCache[int, T]
+    _live: "weakref.WeakValueDictionary[int, T]"
+    _finalizer: weakref.finalize
+    timings: Dict[str, float]
+
+    def __init__(self, entry_type: Type[T], path: str, cache_size: int = 4096):
+        self._entry_type = entry_type
+        self._con = sqlite3.connect(path, check_same_thread=False)
+        self._con.execute("PRAGMA query_only = ON")
+        # dictionaries that are replaced on reload are never closed explicitly, they might still be in use
+        self._finalizer = weakref.finalize(self, self._con.close)
+        self._lock = threading.Lock()
+        self._entries = LRUCache(cache_size)
+        self._live = weakref.WeakValueDictionary()
+        self.timings = {}
+
+    # the database is stored next to db_path, named after the source it's built from: a rebuilt database never
+    # replaces a file that might still be open, which isn't possible on Windows
+    @classmethod
+    def open(cls, entry_type: Type[T], src_path: str, db_path: str, cache_size: int = 4096) -> "SqliteDict[T]":
+        start = time.perf_counter()
+        key = _source_key(entry_type, src_path)
+        root, ext = os.path.splitext(db_path)
+        db_path = f"{root}-{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}{ext}"
+        build_time = None
+        if not cls._has_source_key(db_path, key):
+            build_sqlite_dict(entry_type, src_path, db_path, key)
+            build_time = time.perf_counter() - start
+        _remove_outdated(root, ext, db_path)
+        sdict = cls(entry_type, db_path, cache_size)
+        if build_time is not None:
+            sdict.timings["build"] = build_time
+        sdict.timings["open"] = time.perf_counter() - start
+        return sdict
+
+    @classmethod
+    def is_current(cls, entry_type: Type[T], src_path: str, db_path: str) -> bool:
+        return cls._has_source_key(db_path, _source_key(entry_type, src_path))
+
+    @staticmethod
+    def _has_source_key(db_path: str, key: str) -> bool:
+        if not os.path.exists(db_path):
+            return False
+        con = sqlite3.connect(db_path)
+        try:
+            row = con.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        except sqlite3.DatabaseError:
+            return False
+        finally:
+            con.close()
+        return row is not None and row[0] == key
+
+    def close(self):
+        with self._lock:
+            self._finalizer()
+
+    def _query(self, sql: str, params: tuple) -> List[tuple]:
+        with self._lock:
+            return self._con.execute(sql, params).fetchall()
+
+    def _entry(self, entry_id: int, line: str) -> T:
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            # results are deduplicated by identity, so an entry that is still referenced elsewhere must be reused
+            entry = self._live.get(entry_id)
+            if entry is None:
+                entry = self._live.setdefault(entry_id, self._entry_type.from_line(line))
+            self._entries.put(entry_id, entry)
+        return entry
+
+    def _look_up(self, table: str, key: str) -> Optional[List[T]]:
+        rows = self._query(_look_up_sql[table], (key,))
+        return [self._entry(entry_id, line) for entry_id, line in rows] or None
+
+    def look_up_variant(self, val: str) -> Optional[List[T]]:
+        return self._look_up("variants", val)
+
+    def look_up_reading(self, val: str) -> Optional[List[T]]:
+        return self._look_up("readings", to_hiragana(val))
+
+    def _keys(self, table: str) -> Iterable[str]:
+        return [key for key, in self._query(f"SELECT DISTINCT key FROM {table}", ())]
+
+    def variant_keys(self) -> Iterable[str]:
+        return self._keys("variants")
+
+    def reading_keys(self) -> Iterable[str]:
+        return self._keys("readings")
+
+    def stats(self, memory: bool = False) -> Dict[str, Any]:
+        [(entries,)] = self._query("SELECT COUNT(*) FROM entries", ())
+        [(variant_keys,)] = self._query("SELECT COUNT(DISTINCT key) FROM variants", ())
+        [(reading_keys,)] = self._query("SELECT COUNT(DISTINCT key) FROM readings", ())
+        [(page_count,)] = self._query("PRAGMA page_count", ())
+        [(page_size,)] = self._query("PRAGMA page_size", ())
+        stats: Dict[str, Any] = {
+            "entries": entries,
+            "cached_entries": len(self._entries),
+            "variant_keys": variant_keys,
+            "reading_keys": reading_keys,
+            "database_bytes": page_count * page_size,
+            "timings": dict(self.timings),
+        }
+        if hasattr(self._entry_type, "accents_invalid"):
+            stats["invalid_accents"] = sum(1 for e in list(self._live.values()) if e.accents_invalid())
+        return stats
@@ -1,8 +1,11 @@
 # This project is licensed under the terms of the GNU GPL v3: https://www.gnu.org/licenses/; © 2022 Ben Kerman
 import dataclasses
 import sys
+import threading
+from collections import OrderedDict
 from dataclasses import MISSING, dataclass, is_dataclass
-from typing import Any, Iterable, Optional, Type, TypeVar, Union, get_args, get_origin
+from typing import Any, Generic, Hashable, Iterable, List, Optional, Set, Tuple, Type, TypeVar, Union, get_args, \
+    get_origin
 
 
 def warn(*args):
@@ -16,6 +19,7 @@ class ConfigError:
 
 T = TypeVar("T")
 U = TypeVar("U")
+K = TypeVar("K", bound=Hashable)
 
 
 def escape_text(chrs: Iterable[str], txt: str) -> str:
@@ -129,3 +133,92 @@ def to_json(value: T, default: Optional[T] = None, try_cls_method: bool = True)
             if res is not ConvIgnore:
                 dic[field.name] = res
         return dic
+
+
+def deep_size(obj: Any, seen: Optional[Set[int]] = None, skip: Tuple[type, ...] = ()) -> int:
+    # objects in seen aren't counted again, sharing a set between calls attributes shared objects to the first caller
+    if seen is None:
+        seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        cur = stack.pop()
+        if id(cur) in seen or isinstance(cur, skip):
+            continue
+        seen.add(id(cur))
+        size += sys.getsizeof(cur)
+        if isinstance(cur, dict):
+            stack.extend(cur.keys())
+            stack.extend(cur.values())
+        elif isinstance(cur, (list, tuple, set, frozenset)):
+            stack.extend(cur)
+        else:
+            stack.extend(getattr(cur, slot) for slot in getattr(type(cur), "__slots__", ()) if hasattr(cur, slot))
+            if hasattr(cur, "__dict__"):
+                stack.append(cur.__dict__)
+    return size
+
+
+def format_stats(stats: dict, indent: int = 0) -> List[str]:
+    lines = []
+    for key, val in stats.items():
+        if isinstance(val, dict):
+            lines.append(f"{'  ' * indent}{key}:")
+            lines.extend(format_stats(val, indent + 1))
+        elif isinstance(val, float):
+            lines.append(f"{'  ' * indent}{key}: {val:.3f}")
+        else:
+            lines.append(f"{'  ' * indent}{key}: {val}")
+    return lines
+
+
+class LRUCache(Generic[K, T]):
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
+    _data: "OrderedDict[K, T]"
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _evict(self):
+        while len(self._data) > max(self.max_size, 0):
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: K, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                val = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return val
+
+    def put(self, key: K, val: T):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = val
+            self._data.move_to_end(key)
+            self._evict()
+
+    def resize(self, max_size: int):
+        with self._lock:
+            self.max_size = max_size
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()